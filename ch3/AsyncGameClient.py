@@ -0,0 +1,91 @@
+import os
+import ssl
+import asyncio
+
+import aiomqtt
+from dotenv import load_dotenv
+
+from GameClient import handle_message, init_lobby_state, router
+from GameLogging import configure_logging
+
+
+class AsyncGameServer():
+    def __init__(self, turn_timeout: float = None):
+        """
+        asyncio variant of the GameClient server. Messages and deadlines are handled on the event loop and
+        publishing goes through a queue drained by its own coroutine, so an idle lobby is just its dictionary
+        entries and publishing never holds up message intake
+        :param turn_timeout: seconds after a turn's first move at which the turn is resolved with the moves
+                             received so far, None uses GameClient.TURN_TIMEOUT, 0 waits for every player
+        """
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+        # Same lobby state as the paho client carries in GameClient, so the handlers can be reused as-is
+        init_lobby_state(self)
+        if turn_timeout is not None:
+            self.turn_timeout = turn_timeout
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        # Called by the GameClient handlers, never blocks
+        self.outbox.put_nowait((topic, payload, qos, retain))
+
+    async def handle(self, topic: str, payload: bytes):
+        handle_message(self, topic, payload)
+
+    async def deadline_loop(self):
+        """
+        Runs the turn and lobby deadlines of every lobby, sleeping until the earliest one
+        """
+        wake = asyncio.Event()
+        self.scheduler.wakeup = wake.set
+        while True:
+            self.scheduler.run_due()
+            try:
+                await asyncio.wait_for(wake.wait(), self.scheduler.next_delay())
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+    async def publish_loop(self, client: aiomqtt.Client):
+        while True:
+            topic, payload, qos, retain = await self.outbox.get()
+            await client.publish(topic, payload, qos=qos, retain=retain)
+
+    async def run(self, client: aiomqtt.Client):
+        for pattern in router.patterns:
+            await client.subscribe(pattern)
+
+        publisher = asyncio.create_task(self.publish_loop(client))
+        deadlines = asyncio.create_task(self.deadline_loop())
+        try:
+            async for message in client.messages:
+                payload = message.payload
+                if isinstance(payload, str):
+                    payload = payload.encode()
+                await self.handle(str(message.topic), bytes(payload))
+        finally:
+            publisher.cancel()
+            deadlines.cancel()
+
+
+async def main():
+    load_dotenv(dotenv_path='./credentials.env')
+    configure_logging()
+
+    broker_address = os.environ.get('BROKER_ADDRESS')
+    broker_port = int(os.environ.get('BROKER_PORT'))
+    username = os.environ.get('USER_NAME')
+    password = os.environ.get('PASSWORD')
+    turn_timeout = os.environ.get('TURN_TIMEOUT')
+
+    server = AsyncGameServer(float(turn_timeout) if turn_timeout else None)
+    # TLS like the paho client, HiveMQ Cloud listens on 8883, BROKER_TLS=0 for a plain local broker
+    tls_context = ssl.create_default_context() if os.environ.get('BROKER_TLS', '1') == '1' else None
+    async with aiomqtt.Client(broker_address, broker_port, username=username, password=password,
+                              identifier="AsyncGameClient", protocol=aiomqtt.ProtocolVersion.V5,
+                              tls_context=tls_context) as client:
+        await server.run(client)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler():
+    def __init__(self, clock=time.monotonic):
+        """
+        Deadlines for any number of keys kept in one heap. Rescheduling or cancelling a key leaves its old
+        entry in the heap, entries that no longer are their key's current deadline are dropped when they
+        reach the top
+        :param clock: returns the current time in seconds
+        """
+        self.clock = clock
+        self.lock = threading.RLock() # Held while callbacks run on the scheduler's thread
+        self.wakeup = None # Called when a new earliest deadline is scheduled, lets the driving loop sleep less
+        self.__heap: list[tuple] = []
+        self.__entries: dict = {} # {key : current heap entry}
+        self.__counter = itertools.count()
+        self.__condition = threading.Condition(self.lock)
+        self.__running = False
+        self.__thread = None
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def schedule(self, key, delay: float, callback):
+        """
+        Calls callback() delay seconds from now, replacing any deadline key already has
+        """
+        deadline = self.clock() + delay
+        # The counter keeps entries with equal deadlines from comparing their keys
+        entry = (deadline, next(self.__counter), key, callback)
+        earliest = not self.__heap or deadline < self.__heap[0][0]
+        self.__entries[key] = entry
+        heapq.heappush(self.__heap, entry)
+        if len(self.__heap) > 2 * len(self.__entries) + 64:
+            self.__compact()
+        if earliest and self.wakeup is not None:
+            self.wakeup()
+
+    def cancel(self, key):
+        self.__entries.pop(key, None)
+
+    def next_delay(self) -> float:
+        """
+        :return: seconds until the earliest deadline, None when nothing is scheduled
+        """
+        self.__prune()
+        if not self.__heap:
+            return None
+        return max(0.0, self.__heap[0][0] - self.clock())
+
+    def run_due(self) -> int:
+        """
+        Calls the callbacks of every deadline that has passed
+        :return: number of callbacks called
+        """
+        now = self.clock()
+        count = 0
+        while True:
+            self.__prune()
+            if not self.__heap or self.__heap[0][0] > now:
+                return count
+            _, _, key, callback = heapq.heappop(self.__heap)
+            del self.__entries[key]
+            callback()
+            count += 1
+
+    def run(self, until=None):
+        """
+        Runs callbacks in the calling thread as they come due, holding lock while they run, until stop() is
+        called or until() is true
+        """
+        with self.__condition:
+            self.__running = True
+            self.wakeup = self.__condition.notify
+            while self.__running:
+                self.run_due()
+                if until is not None and until():
+                    break
+                self.__condition.wait(self.next_delay())
+
+    def start(self):
+        """
+        Runs callbacks on one background thread, see run
+        """
+        self.__thread = threading.Thread(target=self.run, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+    def __prune(self):
+        heap = self.__heap
+        while heap and self.__entries.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+
+    def __compact(self):
+        self.__heap = list(self.__entries.values())
+        heapq.heapify(self.__heap)
@@ -1,53 +1,78 @@
 import os
 import json
+import time
+from logging import DEBUG
 import copy
-from collections import OrderedDict
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
 
 import paho.mqtt.client as paho
 from paho import mqtt
 from dotenv import load_dotenv
 
-from InputTypes import NewPlayer
+from InputTypes import parse_new_player, parse_move, parse_start, parse_profile_request
 from game import Game
-from moveset import Moveset
-print("import complete")
+from map import Map
+from arrayMap import ArrayMap
+from GameShards import GameShardPool
+from GameInstanceManger import GameInstanceManager, start_instance_process
+from GameStateDelta import GameStateEncoder
+from WireFormat import negotiate, encode_game_state, encode_scores
+from TopicRouter import TopicRouter
+from DeadlineScheduler import DeadlineScheduler
+from GameLogging import get_logger, configure_logging
+from GameMetrics import counter, gauge, histogram, start_http_server
+from LobbyProfiler import LobbyProfiler, phase
+
+log = get_logger('GameClient')
+map_log = get_logger('GameClient.map')
+
+# Metrics updated by the handlers, metrics read off a client's state are added by register_client_metrics
+dispatch_seconds = histogram('game_dispatch_seconds', 'Time to handle one inbound message')
+turn_seconds = histogram('game_turn_resolution_seconds', 'Time to apply a turn and queue its messages')
+game_data_seconds = histogram('game_game_data_seconds', 'Time for getAllGameData of one lobby')
+validation_failures = counter('game_validation_failures_total', 'Inbound payloads that failed validation', ('kind',))
+games_started = counter('game_games_started_total', 'Games started')
+turns_timed_out = counter('game_turns_timed_out_total', 'Turns resolved by the turn deadline')
+lobbies_expired = counter('game_lobbies_expired_total', 'Lobbies removed by the lobby deadline')
 
 # setting callbacks for different events to see if it works, print the message etc.
 def on_connect(client, userdata, flags, rc, properties=None):
     """
-        Prints the result of the connection with a reasoncode to stdout ( used as callback for connect )
+        Logs the result of the connection with a reasoncode ( used as callback for connect )
         :param client: the client itself
         :param userdata: userdata is set when initiating the client, here it is userdata=None
         :param flags: these are response flags sent by the broker
         :param rc: stands for reasonCode, which is a code for the connection result
         :param properties: can be used in MQTTv5, but is optional
     """
-    print("CONNACK received with code %s." % rc)
+    log.info("CONNACK received with code %s", rc, extra={'event': 'connect'})
 
 
 # with this callback you can see if your publish was successful
 def on_publish(client, userdata, mid, properties=None):
     """
-        Prints mid to stdout to reassure a successful publish ( used as callback for publish )
+        Counts a publish as no longer in flight and sends whatever waited for it ( used as callback for publish )
         :param client: the client itself
         :param userdata: userdata is set when initiating the client, here it is userdata=None
         :param mid: variable returned from the corresponding publish() call, to allow outgoing messages to be tracked
         :param properties: can be used in MQTTv5, but is optional
     """
-    print("mid: " + str(mid))
+    client.publisher.acked(mid)
 
 
 # print which topic was subscribed to
 def on_subscribe(client, userdata, mid, granted_qos, properties=None):
     """
-        Prints a reassurance for successfully subscribing
+        Logs a reassurance for successfully subscribing
         :param client: the client itself
         :param userdata: userdata is set when initiating the client, here it is userdata=None
         :param mid: variable returned from the corresponding publish() call, to allow outgoing messages to be tracked
         :param granted_qos: this is the qos that you declare when subscribing, use the same one for publishing
         :param properties: can be used in MQTTv5, but is optional
     """
-    print("Subscribed: " + str(mid) + " " + str(granted_qos))
+    log.debug("Subscribed: %s %s", mid, granted_qos, extra={'event': 'subscribe'})
 
 
 # triggered on message from subscription
@@ -58,22 +83,40 @@ def on_message(client, userdata, msg):
         :param userdata: userdata is set when initiating the client, here it is userdata=None
         :param msg: the message with topic and payload
     """
-    print("message: " + msg.topic + " " + str(msg.qos) + " " + str(msg.payload))
-    topic_list = msg.topic.split("/")
+    if log.isEnabledFor(DEBUG):
+        log.debug("message", extra={'event': 'message', 'topic': msg.topic, 'qos': msg.qos, 'payload': msg.payload})
+
+    # With a shard pool the front end only routes, the workers run the game logic
+    shards = getattr(client, 'shards', None)
+    if shards is not None:
+        shards.route(msg.topic, msg.payload)
+    else:
+        # The scheduler's thread resolves turns and expires lobbies under the same lock
+        with client.scheduler.lock:
+            handle_message(client, msg.topic, msg.payload)
 
-    # Validate it is input we can deal with
-    if topic_list[-1] in dispatch.keys(): 
-        dispatch[topic_list[-1]](client, topic_list, msg.payload)
 
+def handle_message(client, topic, payload):
+    """
+        Dispatches a message to its handler, topics without a route are ignored, and sends what the handler published
+        :param client: the paho client, or a GameShards.ShardClient inside a worker process
+    """
+    start = time.perf_counter()
+    try:
+        router.dispatch(client, topic, payload)
+    finally:
+        client.publisher.flush()
+        dispatch_seconds.observe(time.perf_counter() - start)
 
 
 # Dispatched function, adds player to a lobby & team
-def add_player(client, topic_list, msg_payload):
+def add_player(client, msg_payload):
     # Parse and Validate Input Data
     try:
-        player = NewPlayer(**json.loads(msg_payload))
-    except:
-        print("ValidationError in create_game")
+        player = parse_new_player(msg_payload)
+    except ValueError as e:
+        validation_failures.labels('new_game').inc()
+        log.warning("Invalid new_game payload", extra={'event': 'invalid', 'error': str(e)})
         return
     
     # If lobby doesn't exists...
@@ -83,10 +126,13 @@ def add_player(client, topic_list, msg_payload):
 
     if client.team_dict[player.lobby_name]['started']:
         publish_error_to_lobby(client, player.lobby_name, "Game has already started, please make a new lobby")
+    else:
+        client.format_dict[player.lobby_name] = negotiate(client.format_dict.get(player.lobby_name), player.wire_format)
 
     add_team(client, player)
+    touch_lobby(client, player.lobby_name)
 
-    print(f'Added Player: {player.player_name} to Team: {player.team_name}')
+    log.info("Added player", extra={'event': 'join', 'lobby': player.lobby_name, 'player': player.player_name, 'team': player.team_name})
 
 
 def add_team(client, player):
@@ -97,52 +143,58 @@ def add_team(client, player):
     else:
         client.team_dict[player.lobby_name][player.team_name].append(player.player_name)
 
-move_to_Moveset = {
-    'UP' : Moveset.UP,
-    'DOWN' : Moveset.DOWN,
-    'LEFT' : Moveset.LEFT,
-    'RIGHT' : Moveset.RIGHT
-}
+# Board backend of new games, 'array' stores the board in numpy arrays and cuts every player's view out of one
+# scan, 'map' keeps the list of lists, whose per-move updates are cheaper (about 64 against 83 us a turn for 20 players)
+MAP_TYPES = {'map': Map, 'array': ArrayMap}
+MAP_TYPE = MAP_TYPES[os.environ.get('MAP_TYPE', 'map').lower()]
+
+# 1 resolves each turn's moves simultaneously instead of one by one in arrival order, see Game.applyMoves.
+# This changes the rules, and only pays off for lobbies of a couple of hundred players or more
+SIMULTANEOUS_TURNS = os.environ.get('SIMULTANEOUS_TURNS', '0') == '1'
+
+# Publish game_state as deltas with a full keyframe every DELTA_KEYFRAME_INTERVAL turns, 0 always sends the full view
+DELTA_KEYFRAME_INTERVAL = int(os.environ.get('DELTA_KEYFRAME_INTERVAL', 0))
+
+# Seconds after a turn's first move at which the turn is resolved with the moves received so far, 0 waits for every player
+TURN_TIMEOUT = float(os.environ.get('TURN_TIMEOUT', 30))
+
+# Seconds without any message for a lobby after which the lobby is removed, 0 keeps lobbies forever
+LOBBY_TIMEOUT = float(os.environ.get('LOBBY_TIMEOUT', 600))
+
+# Where lobby profiles requested on admin/profile are written
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
 
 # Dispatched Function: handles player movement commands
-def player_move(client, topic_list, msg_payload):
-    lobby_name = topic_list[1]
-    player_name = topic_list[2]
+def player_move(client, lobby_name, player_name, msg_payload):
+    if lobby_handed_off(client, lobby_name):
+        # The lobby's GameInstanceManager receives and processes this move itself
+        return
     if lobby_name in client.team_dict.keys():
-        print("inside if")
         try:
-            new_move = msg_payload.decode()
-            
+            try:
+                new_move = parse_move(msg_payload)
+            except ValueError:
+                validation_failures.labels('move').inc()
+                raise
+
             # Check if waiting for suggestion (you need a mechanism to set this flag)
             if 'waiting_for_suggestion' in client.team_dict[lobby_name] and client.team_dict[lobby_name]['waiting_for_suggestion']:
                 # Handle incoming suggestion and clear the flag
-                client.move_dict[lobby_name][player_name] = (player_name, move_to_Moveset[new_move])
+                client.move_dict[lobby_name][player_name] = (player_name, new_move)
                 client.team_dict[lobby_name]['waiting_for_suggestion'] = False
             else:
                 # Normally process the move
-                client.move_dict[lobby_name][player_name] = (player_name, move_to_Moveset[new_move])
+                client.move_dict[lobby_name][player_name] = (player_name, new_move)
 
             game: Game = client.game_dict[lobby_name]
+            touch_lobby(client, lobby_name)
 
             # If all players made a move, resolve movement
             if len(game.all_players) == len(client.move_dict[lobby_name]):
-                for player, move in client.move_dict[lobby_name].values():
-                    game.movePlayer(player, move)
-
-                # Publish player states after all movement is resolved
-                for player, _ in client.move_dict[lobby_name].values():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
-
-                # Clear move list
-                client.move_dict[lobby_name].clear()
-                print(game.map)
-                client.publish(f'games/{lobby_name}/scores', json.dumps(game.getScores()))
-                if game.gameOver():
-                    # Publish game over, remove game
-                    publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
-                    client.team_dict.pop(lobby_name)
-                    client.move_dict.pop(lobby_name)
-                    client.game_dict.pop(lobby_name)
+                resolve_turn(client, lobby_name)
+            elif client.turn_timeout > 0 and ('turn', lobby_name) not in client.scheduler:
+                # First move of the turn, the others have until the deadline
+                client.scheduler.schedule(('turn', lobby_name), client.turn_timeout, lambda: turn_expired(client, lobby_name))
 
         except Exception as e:
             publish_error_to_lobby(client, lobby_name, str(e))
@@ -150,31 +202,270 @@ def player_move(client, topic_list, msg_payload):
         publish_error_to_lobby(client, lobby_name, "Lobby name not found.")
 
 
+def resolve_turn(client, lobby_name):
+    """
+        Applies the moves received for the lobby's current turn and publishes the result
+    """
+    game: Game = client.game_dict[lobby_name]
+    profiler = client.profiler_dict.get(lobby_name)
+    if profiler is None:
+        apply_turn(client, lobby_name, None)
+    else:
+        profiler.run_turn(lambda: apply_turn(client, lobby_name, profiler))
+
+    # Only once the profiler has recorded the turn, so the report includes the last one of the game
+    if game.gameOver():
+        remove_lobby(client, lobby_name)
+    elif profiler is not None and profiler.finished:
+        finish_profile(client, lobby_name)
+
+
+def apply_turn(client, lobby_name, profiler):
+    """
+        The turn pipeline, each phase timed when the lobby is being profiled
+    """
+    start = time.perf_counter()
+    game: Game = client.game_dict[lobby_name]
+    with phase(profiler, 'apply'):
+        game.applyMoves(client.move_dict[lobby_name].values(), sequential=not SIMULTANEOUS_TURNS)
+    client.scheduler.cancel(('turn', lobby_name))
+
+    # Publish player states after all movement is resolved
+    publish_game_states(client, lobby_name, game)
+
+    # Clear move list
+    client.move_dict[lobby_name].clear()
+    with phase(profiler, 'map_log'):
+        map_log.debug("%s", game.map, extra={'event': 'map', 'lobby': lobby_name})
+    with phase(profiler, 'scores'):
+        client.publisher.queue(f'games/{lobby_name}/scores', scores_payload(game, client.format_dict.get(lobby_name, 'json')))
+    if game.gameOver():
+        # Publish game over, resolve_turn removes the game
+        publish_to_lobby(client, lobby_name, "Game Over: All coins have been collected")
+    if profiler is not None:
+        # Normally sent once the handler returns, flushed here so the profile includes it
+        with phase(profiler, 'publish'):
+            client.publisher.flush()
+    turn_seconds.observe(time.perf_counter() - start)
+
+
 # Dispatched function: Instantiates Game object
-def start_game(client, topic_list, msg_payload):
-    lobby_name = topic_list[1]
-    if isinstance(msg_payload, bytes) and msg_payload.decode() == "START":
+def start_game(client, lobby_name, msg_payload):
+    try:
+        command = parse_start(msg_payload)
+    except ValueError:
+        validation_failures.labels('start').inc()
+        return
 
-        if lobby_name in client.team_dict.keys():
+    if command == "START":
+        if lobby_name in client.team_dict.keys() and getattr(client, 'lobby_runner', ''):
+                # hand the lobby to its own GameInstanceManager
+                client.team_dict[lobby_name]["started"] = True
+                games_started.inc()
+                client.runner_dict[lobby_name] = start_lobby_runner(client.lobby_runner, lobby_name, client.team_dict[lobby_name],
+                                                                    client.format_dict.get(lobby_name, 'json'))
+
+        elif lobby_name in client.team_dict.keys():
                 # create new game
-                dict_copy = copy.deepcopy(client.team_dict[lobby_name])
-                dict_copy.pop('started')
+                game = create_game(client, lobby_name)
+                publish_game_states(client, lobby_name, game)
+
+                games_started.inc()
+                log.info("Started game", extra={'event': 'start', 'lobby': lobby_name})
+                map_log.debug("%s", game.map, extra={'event': 'map', 'lobby': lobby_name})
+    elif command == "STOP":
+        if lobby_handed_off(client, lobby_name):
+            # The lobby's GameInstanceManager announces the end of the game itself
+            client.runner_dict.pop(lobby_name)
+            remove_lobby(client, lobby_name)
+            return
+        publish_to_lobby(client, lobby_name, "Game Over: Game has been stopped")
+        remove_lobby(client, lobby_name)
 
-                game = Game(dict_copy)
-                client.game_dict[lobby_name] = game
-                client.move_dict[lobby_name] = OrderedDict()
-                client.team_dict[lobby_name]["started"] = True
 
-                for player in game.all_players.keys():
-                    client.publish(f'games/{lobby_name}/{player}/game_state', json.dumps(game.getGameData(player)))
+def scores_payload(game, wire_format):
+    """
+        Returns the lobby's encoded scores, only re-encoded when a score changed since the last turn
+    """
+    def build(game):
+        payload = encode_scores(game.getScores(), wire_format)
+        return payload.encode() if isinstance(payload, str) else payload
+    return game.cachedPayload(('scores', wire_format), build)
+
+
+def publish_game_states(client, lobby_name, game):
+    # Deltas are always sent as JSON, the negotiated wire format applies to full views
+    encoder = client.encoder_dict.get(lobby_name)
+    wire_format = client.format_dict.get(lobby_name, 'json')
+    profiler = client.profiler_dict.get(lobby_name)
+    start = time.perf_counter()
+    with phase(profiler, 'game_data'):
+        all_game_data = game.getAllGameData()
+    game_data_seconds.observe(time.perf_counter() - start)
+    with phase(profiler, 'encode'):
+        for player, game_data in all_game_data.items():
+            if encoder is not None:
+                payload = json.dumps(encoder.encode(player, game_data))
+            else:
+                payload = encode_game_state(game_data, wire_format)
+            client.publisher.queue(f'games/{lobby_name}/{player}/game_state', payload)
+
+
+def create_game(client, lobby_name):
+    """
+        Creates the Game for a lobby from its teams and marks the lobby as started
+    """
+    dict_copy = copy.deepcopy(client.team_dict[lobby_name])
+    dict_copy.pop('started')
+
+    game = Game(dict_copy, mapType=MAP_TYPE)
+    client.game_dict[lobby_name] = game
+    client.move_dict[lobby_name] = OrderedDict()
+    if DELTA_KEYFRAME_INTERVAL > 0:
+        client.encoder_dict[lobby_name] = GameStateEncoder(DELTA_KEYFRAME_INTERVAL)
+    client.team_dict[lobby_name]["started"] = True
+    touch_lobby(client, lobby_name)
+    return game
 
 
-                print(game.map)
-    elif isinstance(msg_payload, bytes) and msg_payload.decode() == "STOP":
-        publish_to_lobby(client, lobby_name, "Game Over: Game has been stopped")
-        client.team_dict.pop(lobby_name, None)
-        client.move_dict.pop(lobby_name, None)
-        client.game_dict.pop(lobby_name, None)
+def init_lobby_state(client):
+    """
+        Adds the per-lobby dictionaries the handlers keep on a client
+    """
+    client.team_dict = {} # Keeps tracks of players before a game starts {'lobby_name' : {'team_name' : [player_name, ...]}}
+    client.game_dict = {} # Keeps track of the games {'lobby_name' : Game Object}
+    client.move_dict = {} # Keeps track of the moves of the current turn {'lobby_name' : {player_name : (player_name, Moveset)}}
+    client.encoder_dict = {} # Keeps track of delta encoders for lobbies in delta mode {'lobby_name' : GameStateEncoder}
+    client.format_dict = {} # Keeps track of the wire format each lobby negotiated {'lobby_name' : 'json' | 'binary' | 'msgpack'}
+    client.scheduler = DeadlineScheduler() # Keeps track of turn and lobby deadlines {('turn' | 'lobby', 'lobby_name') : deadline}
+    client.publisher = Publisher(client) # Collects outgoing messages until the end of the handler or deadline
+    client.profiler_dict = {} # Keeps track of lobbies being profiled {'lobby_name' : LobbyProfiler}
+    client.turn_timeout = TURN_TIMEOUT
+    client.lobby_timeout = LOBBY_TIMEOUT
+
+
+def remove_lobby(client, lobby_name):
+    finish_profile(client, lobby_name)
+    client.team_dict.pop(lobby_name, None)
+    client.move_dict.pop(lobby_name, None)
+    client.game_dict.pop(lobby_name, None)
+    client.encoder_dict.pop(lobby_name, None)
+    client.format_dict.pop(lobby_name, None)
+    client.scheduler.cancel(('turn', lobby_name))
+    client.scheduler.cancel(('lobby', lobby_name))
+
+
+def touch_lobby(client, lobby_name):
+    """
+        Pushes the lobby's expiry deadline back by the lobby timeout
+    """
+    if client.lobby_timeout > 0:
+        client.scheduler.schedule(('lobby', lobby_name), client.lobby_timeout, lambda: expire_lobby(client, lobby_name))
+
+
+def turn_expired(client, lobby_name):
+    """
+        Resolves the lobby's turn with the moves received so far
+    """
+    if client.move_dict.get(lobby_name):
+        turns_timed_out.inc()
+        resolve_turn(client, lobby_name)
+        client.publisher.flush()
+
+
+def expire_lobby(client, lobby_name):
+    if lobby_handed_off(client, lobby_name):
+        # The lobby's GameInstanceManager expires the lobby itself
+        touch_lobby(client, lobby_name)
+        return
+    lobbies_expired.inc()
+    publish_to_lobby(client, lobby_name, "Game Over: Lobby expired")
+    remove_lobby(client, lobby_name)
+    client.publisher.flush()
+
+
+def start_lobby_runner(mode, lobby_name, team_dict, wire_format):
+    """
+        Starts a GameInstanceManager for a lobby
+        :param mode: 'thread' to run it on its client's network thread, 'process' to run it in its own process
+        :param wire_format: the wire format the lobby negotiated
+        :return: the manager, or its process
+    """
+    if mode == 'process':
+        return start_instance_process(lobby_name, team_dict, wire_format)
+    manager = GameInstanceManager(lobby_name, team_dict, wire_format=wire_format)
+    manager.start()
+    return manager
+
+
+def lobby_handed_off(client, lobby_name):
+    """
+        Checks whether a GameInstanceManager runs the lobby, forgetting managers whose game has ended
+    """
+    runner_dict = getattr(client, 'runner_dict', None)
+    if not runner_dict or lobby_name not in runner_dict:
+        return False
+
+    runner = runner_dict[lobby_name]
+    running = runner.is_alive() if isinstance(runner, multiprocessing.process.BaseProcess) else not runner.finished
+    if not running:
+        runner_dict.pop(lobby_name)
+        remove_lobby(client, lobby_name)
+    return running
+
+
+# Dispatched function: starts or stops profiling a running lobby's turns
+def profile_lobby(client, msg_payload):
+    try:
+        request = parse_profile_request(msg_payload)
+    except ValueError as e:
+        validation_failures.labels('profile').inc()
+        log.warning("Invalid admin/profile payload", extra={'event': 'invalid', 'error': str(e)})
+        return
+
+    lobby_name = request.lobby_name
+    if lobby_name not in client.game_dict:
+        # Not running here, another shard or lobby runner may own it
+        return
+
+    # A new request replaces the running one, which still reports what it has
+    finish_profile(client, lobby_name)
+    if not request.stop:
+        client.profiler_dict[lobby_name] = LobbyProfiler(lobby_name, request.turns, request.every, request.cprofile, PROFILE_DIR)
+        log.info("Profiling lobby", extra={'event': 'profile', 'lobby': lobby_name, 'turns': request.turns})
+
+
+def finish_profile(client, lobby_name):
+    """
+        Publishes the report of the lobby's profiler, if it has one, on admin/profile/<lobby_name>
+    """
+    profiler = client.profiler_dict.pop(lobby_name, None)
+    if profiler is None:
+        return
+    report = profiler.report()
+    client.publisher.queue(f'admin/profile/{lobby_name}', json.dumps(report), qos=1)
+    log.info("Profiled lobby", extra={'event': 'profile', 'lobby': lobby_name, 'turns': profiler.turns_done})
+
+
+def register_client_metrics(client):
+    """
+        Adds the metrics read off the client's lobby state and publisher, computed only when scraped
+    """
+    def lobbies():
+        teams = list(client.team_dict.values())
+        running = sum(1 for lobby in teams if lobby['started'])
+        return {('running',): running, ('waiting',): len(teams) - running}
+
+    def messages():
+        counts = {(pattern,): count for pattern, count in router.counts().items()}
+        counts[('unmatched',)] = router.unmatched
+        return counts
+
+    gauge('game_lobbies', 'Lobbies by state', ('state',), function=lobbies)
+    gauge('game_publish_pending', 'Outgoing messages waiting to be sent', function=lambda: len(client.publisher.pending))
+    gauge('game_publish_in_flight', 'Outgoing messages not acked yet', function=lambda: client.publisher.in_flight)
+    gauge('game_scheduled_deadlines', 'Turn and lobby deadlines scheduled', function=lambda: len(client.scheduler))
+    counter('game_messages_total', 'Inbound messages per route', ('route',), function=messages)
 
 
 def publish_error_to_lobby(client, lobby_name, error):
@@ -182,18 +473,104 @@ def publish_error_to_lobby(client, lobby_name, error):
 
 
 def publish_to_lobby(client, lobby_name, msg):
-    client.publish(f"games/{lobby_name}/lobby", msg)
+    client.publisher.queue(f"games/{lobby_name}/lobby", msg)
 
 
-dispatch = {
-    'new_game' : add_player,
-    'move' : player_move,
-    'start' : start_game,
+# QoS per topic class, the last topic level. game_state is superseded every turn, so it is sent at most once
+TOPIC_QOS = {
+    'game_state' : 0,
+    'scores' : 1,
+    'lobby' : 1,
 }
 
+# Messages the broker has not acknowledged yet before further messages wait, 0 for no limit
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 1000))
+
+
+class Publisher():
+    def __init__(self, client, max_in_flight: int = 0):
+        """
+        Holds a handler's outgoing messages until it finishes, then publishes them with the QoS of their topic class
+        and within the in-flight limit. Each message is still its own publish call, messages go to different
+        topics (one game_state per player) and are not coalesced
+        :param client: anything with a paho-style publish(topic, payload, qos, retain)
+        :param max_in_flight: limit on messages sent but not yet acked through acked(), 0 sends everything
+                              right away and does not track acks
+        """
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.pending = deque() # (topic, payload, qos, retain) waiting to be sent
+        self.in_flight = 0
+        self.sent = 0
+        # on_publish runs on the network thread while handlers may run on the scheduler's,
+        # and paho may call it from inside publish
+        self.__lock = threading.Lock()
+        self.__flushing = False # Whether some thread is in flush's loop, at most one is
+
+    def queue(self, topic: str, payload, qos: int = None, retain: bool = False):
+        """
+        :param qos: QoS of the message, by default the QoS of its topic class in TOPIC_QOS
+        """
+        if qos is None:
+            qos = TOPIC_QOS.get(topic[topic.rfind('/')+1:], 0)
+        self.pending.append((topic, payload, qos, retain))
+
+    def flush(self):
+        """
+        Sends queued messages in order until the in-flight limit is reached, the rest wait for acks.
+        Returns at once if another call is already sending, that call picks up whatever is queued or acked
+        meanwhile. publish is called without the lock held, so acks arriving from inside it or from the
+        network thread only update the count
+        """
+        with self.__lock:
+            if self.__flushing:
+                return
+            self.__flushing = True
+        try:
+            while True:
+                with self.__lock:
+                    if not self.pending or 0 < self.max_in_flight <= self.in_flight:
+                        self.__flushing = False
+                        return
+                    topic, payload, qos, retain = self.pending.popleft()
+                    # The slot is taken before publish, which may ack the message before it returns
+                    if self.max_in_flight > 0:
+                        self.in_flight += 1
+                try:
+                    self.client.publish(topic, payload, qos=qos, retain=retain)
+                except BaseException:
+                    with self.__lock:
+                        if self.max_in_flight > 0:
+                            self.in_flight -= 1
+                    raise
+                self.sent += 1
+        finally:
+            with self.__lock:
+                self.__flushing = False
+
+    def acked(self, mid):
+        """
+        Frees the message's in-flight slot, and sends what waited for it unless a flush is already under way
+        """
+        with self.__lock:
+            if self.in_flight > 0:
+                self.in_flight -= 1
+            drain = bool(self.pending) and not self.__flushing
+        if drain:
+            self.flush()
+
+
+# Subscribed topics and their handlers, each '+' level is passed to the handler before the payload
+router = TopicRouter() \
+    .add('new_game', add_player) \
+    .add('games/+/start', start_game) \
+    .add('games/+/+/move', player_move) \
+    .add('admin/profile', profile_lobby)
+
 
 if __name__ == '__main__':
     load_dotenv(dotenv_path='./credentials.env')
+    configure_logging()
     
     broker_address = os.environ.get('BROKER_ADDRESS')
     broker_port = int(os.environ.get('BROKER_PORT'))
@@ -202,25 +579,45 @@ if __name__ == '__main__':
 
     client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id="GameClient", userdata=None, protocol=paho.MQTTv5)
     
-    # enable TLS for secure connection
-    client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # enable TLS for secure connection, BROKER_TLS=0 for a plain local broker such as mosquitto
+    if os.environ.get('BROKER_TLS', '1') == '1':
+        client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
     # set username and password
-    client.username_pw_set(username, password)
+    if username:
+        client.username_pw_set(username, password)
     # connect to HiveMQ Cloud on port 8883 (default for MQTT)
     client.connect(broker_address, broker_port)
 
     # setting callbacks, use separate functions like above for better visibility
-    client.on_subscribe = on_subscribe # Can comment out to not print when subscribing to new topics
+    client.on_subscribe = on_subscribe # Can comment out to not log when subscribing to new topics
     client.on_message = on_message
-    client.on_publish = on_publish # Can comment out to not print when publishing to topics
+    client.on_publish = on_publish # Tracks acks for the publisher's in-flight limit
     
-    # custom dictionary to track players
-    client.team_dict = {} # Keeps tracks of players before a game starts {'lobby_name' : {'team_name' : [player_name, ...]}}
-    client.game_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
-    client.move_dict = {} # Keeps track of the games {{'lobby_name' : Game Object}
+    # custom dictionaries to track players, games and moves per lobby
+    init_lobby_state(client)
+    # on_publish reports acks, so outgoing messages can be limited to MAX_IN_FLIGHT
+    client.publisher.max_in_flight = MAX_IN_FLIGHT
+
+    # NUM_WORKERS > 0 shards lobbies across that many worker processes, 0 runs every lobby in this process
+    # LOBBY_RUNNER=thread or process runs each started lobby in its own GameInstanceManager
+    client.lobby_runner = os.environ.get('LOBBY_RUNNER', '')
+    client.runner_dict = {} # Keeps track of lobbies handed to a GameInstanceManager {'lobby_name' : manager or process}
+
+    num_workers = int(os.environ.get('NUM_WORKERS', 0))
+    client.shards = GameShardPool(num_workers) if num_workers > 0 else None
+
+    # METRICS_PORT > 0 serves metrics at http://127.0.0.1:METRICS_PORT/metrics, with shards they cover the front end only
+    register_client_metrics(client)
+    metrics_port = int(os.environ.get('METRICS_PORT', 0))
+    if metrics_port > 0:
+        start_http_server(metrics_port)
+    if client.shards is not None:
+        client.shards.start(client)
+    else:
+        # One thread runs the turn and lobby deadlines of every lobby
+        client.scheduler.start()
 
-    client.subscribe("new_game")
-    client.subscribe('games/+/start')
-    client.subscribe('games/+/+/move')
+    for pattern in router.patterns:
+        client.subscribe(pattern)
 
     client.loop_forever()
\ No newline at end of file
@@ -1,64 +1,155 @@
 import os
-import json
+import copy
+import threading
+import multiprocessing
 
 import paho.mqtt.client as paho
 from paho import mqtt
 from dotenv import load_dotenv
-from pydantic import ValidationError
 
-from InputTypes import NewPlayer, Move
-from game import Game
+from InputTypes import parse_start
+from GameLogging import configure_logging
 
 
-# Global Variables
-load_dotenv(dotenv_path='./credentials.env')
+def connect_client(client_id: str) -> paho.Client:
+    """
+        Creates a paho client connected to the broker configured in credentials.env
+    """
+    load_dotenv(dotenv_path='./credentials.env')
+    broker_address = os.environ.get('BROKER_ADDRESS')
+    broker_port = int(os.environ.get('BROKER_PORT'))
+    username = os.environ.get('USER_NAME')
+    password = os.environ.get('PASSWORD')
 
-broker_address = os.environ.get('BROKER_ADDRESS')
-broker_port = int(os.environ.get('BROKER_PORT'))
-username = os.environ.get('USERNAME')
-password = os.environ.get('PASSWORD')
+    client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id=client_id, userdata=None, protocol=paho.MQTTv5)
+    # enable TLS for secure connection, BROKER_TLS=0 for a plain local broker such as mosquitto
+    if os.environ.get('BROKER_TLS', '1') == '1':
+        client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
+    # set username and password
+    if username:
+        client.username_pw_set(username, password)
+    # connect to HiveMQ Cloud on port 8883 (default for MQTT)
+    client.connect(broker_address, broker_port)
+    return client
 
 
-def on_message(self, client, userdata, msg):
+class GameInstanceManager():
+    def __init__(self, lobby_name: str, team_dict: dict[str,list[str]], client: paho.Client = None, wire_format: str = 'json'):
         """
-        Prints a mqtt message to stdout ( used as callback for subscribe )
-        :param client: the client itself
-        :param userdata: userdata is set when initiating the client, here it is userdata=None
-        :param msg: the message with topic and payload
+        Runs a single lobby on its own client: owns the lobby's Game, processes its moves and publishes its state.
+        The client is connected and the game created in run, so constructing a manager never blocks on the broker
+        :param team_dict: {'team_name' : [player_name, ...]} for the lobby
+        :param client: client to use, by default a new client connected with the lobby name as client id
+        :param wire_format: the wire format the lobby negotiated, see WireFormat
         """
-        pass
-
+        self.lobby_name = lobby_name
+        self.team_dict = copy.deepcopy(team_dict)
+        self.client = client
+        self.wire_format = wire_format
+        self.game = None
+        self.thread = None
 
-class GameInstanceManager():
-    def __init__(self, lobby_name: str, team_dict: dict[str,list[str]]):
+    def connect(self):
         """
-        Creates a new client to handle each game
+        Connects the lobby's client, unless one was given, creates the game and subscribes to the lobby's topics
         """
-        # initialize new client
-        self.client = paho.Client(callback_api_version=paho.CallbackAPIVersion.VERSION1, client_id=lobby_name, userdata=None, protocol=paho.MQTTv5)
-        # enable TLS for secure connection
-        self.client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
-        # set username and password
-        self.client.username_pw_set(username, password)
-        # connect to HiveMQ Cloud on port 8883 (default for MQTT)
-        self.client.connect(broker_address, broker_port)
+        own_client = self.client is None
+        if own_client:
+            self.client = connect_client(self.lobby_name)
+
+        # Imported here as GameClient imports this module
+        from GameClient import init_lobby_state, create_game, on_publish, MAX_IN_FLIGHT
+
+        # The GameClient handlers keep their state on the client, so give this client a single lobby
+        self.team_dict['started'] = False
+        init_lobby_state(self.client)
+        if own_client:
+            # on_publish reports acks, so outgoing messages can be limited to MAX_IN_FLIGHT
+            self.client.on_publish = on_publish
+            self.client.publisher.max_in_flight = MAX_IN_FLIGHT
+        self.client.team_dict[self.lobby_name] = self.team_dict
+        self.client.format_dict[self.lobby_name] = self.wire_format
+        self.game = create_game(self.client, self.lobby_name)
+
         # handles subscription
         self.client.on_message = self.on_message
 
-        # subscribes to player movement topics
-        for team in team_dict.keys():
-             for player in team_dict[team]:  
-                self.client.subscribe(f"games/{lobby_name}/{player}/move")
+        # subscribes to player movement topics, and to the start topic to hear STOP
+        for player in self.game.all_players.keys():
+            self.client.subscribe(f"games/{self.lobby_name}/{player}/move")
+        self.client.subscribe(f"games/{self.lobby_name}/start")
+        # profiling requests name their lobby in the payload, other lobbies' requests are ignored
+        self.client.subscribe("admin/profile")
+
+    @property
+    def finished(self) -> bool:
+        if self.game is None:
+            # Not connected yet, or the runner thread failed to connect
+            return self.thread is not None and not self.thread.is_alive()
+        return self.lobby_name not in self.client.game_dict
+
+    def on_message(self, client, userdata, msg):
+        """
+            Runs the lobby's game logic for a move or STOP message
+            :param client: the client itself
+            :param userdata: userdata is set when initiating the client, here it is userdata=None
+            :param msg: the message with topic and payload
+        """
+        # Imported here as GameClient imports this module
+        from GameClient import handle_message
+
+        # The lobby is already running, only STOP is meaningful on the start topic
+        if msg.topic.endswith('/start'):
+            try:
+                if parse_start(msg.payload) != 'STOP':
+                    return
+            except ValueError:
+                return
+
+        with self.client.scheduler.lock:
+            handle_message(client, msg.topic, msg.payload)
+            if self.finished:
+                self.client.scheduler.stop()
+
+    def publish_game_states(self):
+        from GameClient import publish_game_states
+        publish_game_states(self.client, self.lobby_name, self.game)
+        self.client.publisher.flush()
 
     def start(self):
-        self.client.loop_start()
+        """
+        Runs the lobby in a background thread, see run
+        """
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
 
-    def __del__(self):
-        self.client.loop_stop()
+    def run(self):
+        """
+        Connects, publishes the initial game state and processes the lobby until the game ends or the lobby expires:
+        messages on the client's network thread, turn and lobby deadlines in the calling thread
+        """
+        self.connect()
+        self.publish_game_states()
+        self.client.loop_start()
+        self.client.scheduler.run(until=lambda: self.finished)
         self.client.disconnect()
+        self.client.loop_stop()
+
+    def stop(self):
+        if self.game is not None:
+            self.client.scheduler.stop()
+
 
+def run_instance(lobby_name: str, team_dict: dict[str,list[str]], wire_format: str = 'json'):
+    configure_logging()
+    GameInstanceManager(lobby_name, team_dict, wire_format=wire_format).run()
 
-    
 
-if __name__ == "__main__":
-    game = GameInstanceManager()
+def start_instance_process(lobby_name: str, team_dict: dict[str,list[str]], wire_format: str = 'json') -> multiprocessing.Process:
+    """
+    Runs a lobby in its own process, its client is created inside that process
+    """
+    # Spawned rather than forked, the parent is a connected, multithreaded client
+    process = multiprocessing.get_context('spawn').Process(target=run_instance, args=(lobby_name, team_dict, wire_format), daemon=True)
+    process.start()
+    return process
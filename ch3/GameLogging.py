@@ -0,0 +1,102 @@
+"""
+Structured logging for the game server
+
+Server loggers are stdlib loggers under 'server', configured from the environment by configure_logging:
+    LOG_LEVEL  - level of the server loggers, INFO by default
+    LOG_FORMAT - 'text' or 'json'
+    LOG_SAMPLE - keep 1 in N records of an event, e.g. 'message=100,move=10'
+    LOG_MAPS   - 1 to log the map after every turn, on the 'server.GameClient.map' logger
+Fields passed with extra={...} are appended to text records as key=value and become keys of json records,
+'event' names the kind of record for sampling. A call at a disabled level returns before any formatting,
+so hot paths pass values as arguments rather than building strings, and guard costlier work with isEnabledFor.
+"""
+
+import json
+import logging
+import os
+import sys
+
+ROOT = 'server'
+
+# Attributes every LogRecord has, everything else on a record came in through extra
+RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f'{ROOT}.{name}')
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in RECORD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {'ts': record.created, 'level': record.levelname, 'logger': record.name, 'msg': record.getMessage()}
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, rates: dict[str, int]):
+        """
+        :param rates: {event : N} keeps the first and then every N-th record of each event
+        """
+        super().__init__()
+        self.rates = rates
+        self.seen: dict[str, int] = {}
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        rate = self.rates.get(event)
+        if rate is None or rate <= 1:
+            return True
+        count = self.seen.get(event, 0)
+        self.seen[event] = count + 1
+        return count % rate == 0
+
+
+def parse_sample_rates(spec: str) -> dict[str, int]:
+    rates = {}
+    for item in filter(None, spec.split(',')):
+        event, rate = item.split('=')
+        rates[event.strip()] = int(rate)
+    return rates
+
+
+def configure_logging(level: str = None, fmt: str = None, sample: str = None, maps: bool = None):
+    """
+    Sets up the server loggers once, arguments left as None are read from the environment
+    """
+    root = logging.getLogger(ROOT)
+    if root.handlers:
+        return
+
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'text')
+    sample = sample if sample is not None else os.environ.get('LOG_SAMPLE', '')
+    maps = maps if maps is not None else os.environ.get('LOG_MAPS', '0') == '1'
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    handler.addFilter(SampleFilter(parse_sample_rates(sample)))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    root.propagate = False
+
+    # Map dumps build a string over every cell, they are only logged when asked for
+    get_logger('GameClient.map').setLevel(logging.DEBUG if maps else logging.CRITICAL + 1)
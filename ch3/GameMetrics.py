@@ -0,0 +1,213 @@
+"""
+Prometheus-style metrics for the game server, in the text exposition format
+
+Counters and histograms are updated in place on the hot paths, an increment is an attribute update and an
+observation a bisect over the buckets. Anything that can be read off existing state (lobby counts, queue
+depths, the router's per-route counts) is registered as a callback and only computed when scraped, so
+nothing is paid for it while nobody is scraping.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds, from well under a turn's usual cost to far past it
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric(ABC):
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), function=None):
+        """
+        :param function: computes the metric's value when scraped, returning a number, or
+                         {label values : number} for a labelled metric
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self.children: dict[tuple, Metric] = {}
+
+    def labels(self, *values):
+        """
+        :return: the child metric for these label values, created on first use
+        """
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = type(self).__new__(type(self))
+            child._init_child(self)
+        return child
+
+    def _init_child(self, parent):
+        pass
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        if self.function is not None:
+            value = self.function()
+            if isinstance(value, dict):
+                for values, sample in value.items():
+                    lines.append(f'{self.name}{format_labels(self.labelnames, values)} {sample}')
+            else:
+                lines.append(f'{self.name} {value}')
+        elif self.labelnames:
+            for values, child in self.children.items():
+                lines.extend(child.samples(self.name, format_labels(self.labelnames, values)))
+        else:
+            lines.extend(self.samples(self.name, ''))
+        return lines
+
+    @abstractmethod
+    def samples(self, name: str, labels: str) -> list[str]:
+        """
+        :param labels: the formatted label set of the sample, '' for an unlabelled metric
+        :return: the metric's sample lines
+        """
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), function=None):
+        super().__init__(name, help, labelnames, function)
+        self.value = 0
+
+    def _init_child(self, parent):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        return [f'{name}{labels} {self.value}']
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), function=None):
+        super().__init__(name, help, labelnames, function)
+        self.value = 0
+
+    def _init_child(self, parent):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        return [f'{name}{labels} {self.value}']
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # The last one counts observations past every bucket
+        self.sum = 0.0
+
+    def _init_child(self, parent):
+        self.buckets = parent.buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        # Bucket counts are cumulative in the exposition format
+        lines = []
+        total = 0
+        inner = labels[1:-1] + ',' if labels else ''
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{inner}le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{labels} {self.sum}')
+        lines.append(f'{name}_count{labels} {total}')
+        return lines
+
+
+class Registry():
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Adds metric, unless a metric of the same kind is already registered under its name. Modules defining
+        metrics can then be imported more than once (GameInstanceManager's thread mode re-imports GameClient)
+        and keep counting into the metrics already scraped, while a clash between two different metrics fails
+        :return: the registered metric, which callers must use rather than the one passed in. For a metric
+                 computed when scraped, the registered metric now calls the new function
+        """
+        existing = self.metrics.get(metric.name)
+        if existing is None:
+            self.metrics[metric.name] = metric
+            return metric
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames \
+                or (existing.function is None) != (metric.function is None) \
+                or getattr(existing, 'buckets', None) != getattr(metric, 'buckets', None):
+            raise ValueError(f'Metric {metric.name} is already registered as a different {existing.type}')
+        if metric.function is not None:
+            existing.function = metric.function
+        return existing
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.render())
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: tuple = (), function=None) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames, function))
+
+
+def gauge(name: str, help: str, labelnames: tuple = (), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames, function))
+
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def start_http_server(port: int, address: str = '127.0.0.1', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serves the registry at http://address:port/metrics from a background thread
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are not worth a log line each
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
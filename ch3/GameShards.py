@@ -0,0 +1,116 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+
+from GameLogging import get_logger, configure_logging
+
+log = get_logger('GameShards')
+
+
+class ShardClient():
+    """
+    Stands in for the paho client inside a worker process: it owns the lobby dictionaries of
+    the lobbies hashed to this worker and hands everything it publishes back to the front end
+    """
+    def __init__(self, outbox):
+        # Imported here as GameClient imports this module
+        from GameClient import init_lobby_state
+        self.outbox = outbox
+        init_lobby_state(self)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.outbox.put((topic, payload, qos, retain))
+
+
+def worker_main(inbox, outbox):
+    """
+    Worker process loop: runs the GameClient handlers for every message routed to this shard
+    """
+    # Imported here so the front end can import this module without a circular import
+    from GameClient import handle_message
+
+    configure_logging()
+    client = ShardClient(outbox)
+    while True:
+        # Wake up for the next turn or lobby deadline of this worker's lobbies
+        try:
+            message = inbox.get(timeout=client.scheduler.next_delay())
+        except queue.Empty:
+            client.scheduler.run_due()
+            continue
+        if message is None:
+            break
+        topic, payload = message
+        try:
+            handle_message(client, topic, payload)
+        except Exception:
+            log.exception("Worker failed", extra={'event': 'worker_error', 'pid': os.getpid(), 'topic': topic})
+        client.scheduler.run_due()
+
+
+class GameShardPool():
+    def __init__(self, num_workers: int = None, start_method: str = 'spawn'):
+        """
+        Pool of worker processes that each own a share of the lobbies
+        :param num_workers: number of worker processes, defaults to the number of CPUs
+        :param start_method: multiprocessing start method of the workers. The front end starts them once its
+                             client is connected and its threads are running, a forked worker would inherit the
+                             broker socket and locks held by those threads, so they are spawned by default
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.context = multiprocessing.get_context(start_method)
+        self.inboxes = [self.context.Queue() for _ in range(self.num_workers)]
+        self.outbox = self.context.Queue()
+        self.workers = [self.context.Process(target=worker_main, args=(inbox, self.outbox), daemon=True)
+                        for inbox in self.inboxes]
+        self.publisher = None
+
+    def shard_for(self, lobby_name: str) -> int:
+        # crc32 rather than hash() so every process agrees on the shard
+        return zlib.crc32(lobby_name.encode()) % self.num_workers
+
+    def route(self, topic: str, payload: bytes):
+        """
+        Sends a message to the worker owning its lobby. new_game and admin/profile carry the lobby in their
+        payload, payloads that cannot be parsed go to worker 0, which reports the validation error
+        """
+        if topic in ('new_game', 'admin/profile'):
+            try:
+                lobby_name = json.loads(payload)['lobby_name']
+                shard = self.shard_for(str(lobby_name))
+            except (ValueError, KeyError, TypeError):
+                shard = 0
+        else:
+            shard = self.shard_for(topic.split('/')[1])
+        self.inboxes[shard].put((topic, payload))
+
+    def start(self, client):
+        """
+        Starts the workers and a thread publishing their outgoing messages through client's publisher
+        :param client: the front end's client, set up by GameClient.init_lobby_state
+        """
+        for worker in self.workers:
+            worker.start()
+        self.publisher = threading.Thread(target=self.__publish_loop, args=(client,), daemon=True)
+        self.publisher.start()
+
+    def __publish_loop(self, client):
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                break
+            # The workers chose the QoS, the front end's publisher limits what is in flight
+            client.publisher.queue(*message)
+            client.publisher.flush()
+
+    def stop(self):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.outbox.put(None)
+        if self.publisher is not None:
+            self.publisher.join()
@@ -0,0 +1,119 @@
+"""
+Delta encoding for game_state messages
+
+A message is either a keyframe carrying the full getGameData view:
+    {'seq': 7, 'keyframe': True, 'state': {...}}
+or a delta against the previous message for the same player, empty sections left out:
+    {'seq': 8, 'added': {'coin1': [[x,y],...], ...}, 'removed': {'walls': [[x,y],...], ...}, 'changed': {'currentPosition': [x,y], ...}}
+Position lists are diffed as sets, the teammate lists and currentPosition are resent whole when they change.
+"""
+
+# Position lists that are sent as added/removed entries
+SET_KEYS = ('coin1', 'coin2', 'coin3', 'walls', 'enemyPositions')
+
+
+def to_locs(positions) -> set[tuple[int, int]]:
+    return {tuple(loc) for loc in positions}
+
+
+def from_locs(locs) -> list[list[int]]:
+    # getGameData lists positions in row-major order
+    return [list(loc) for loc in sorted(locs)]
+
+
+def to_json_view(game_data: dict) -> dict:
+    """
+    :return: game_data as it looks after a JSON round trip, positions as lists
+    """
+    view = {}
+    for key, value in game_data.items():
+        if key in ('currentPosition', 'teammateNames'):
+            view[key] = list(value)
+        else:
+            view[key] = [list(loc) for loc in value]
+    return view
+
+
+class GameStateEncoder():
+    def __init__(self, keyframe_interval: int = 10):
+        """
+        Server side: turns each player's game_state into keyframes and deltas
+        :param keyframe_interval: every keyframe_interval-th message of a player is a full keyframe
+        """
+        assert keyframe_interval > 0
+        self.keyframe_interval = keyframe_interval
+        self.last_states: dict[str, dict] = {}
+        self.seqs: dict[str, int] = {}
+
+    def encode(self, player_name: str, game_data: dict) -> dict:
+        seq = self.seqs.get(player_name, -1) + 1
+        self.seqs[player_name] = seq
+        state = to_json_view(game_data)
+        last = self.last_states.get(player_name)
+        self.last_states[player_name] = state
+
+        if last is None or seq % self.keyframe_interval == 0:
+            return {'seq': seq, 'keyframe': True, 'state': state}
+
+        added, removed, changed = {}, {}, {}
+        for key in SET_KEYS:
+            old, new = to_locs(last[key]), to_locs(state[key])
+            if new - old:
+                added[key] = from_locs(new - old)
+            if old - new:
+                removed[key] = from_locs(old - new)
+        for key in ('currentPosition', 'teammateNames', 'teammatePositions'):
+            if state[key] != last[key]:
+                changed[key] = state[key]
+
+        # Empty sections are left out
+        message = {'seq': seq}
+        for section, entries in (('added', added), ('removed', removed), ('changed', changed)):
+            if entries:
+                message[section] = entries
+        return message
+
+    def keyframe_next(self, player_name: str = None):
+        """
+        Makes the next message for the player, or for every player, a keyframe
+        """
+        players = list(self.last_states) if player_name is None else [player_name]
+        for player in players:
+            self.last_states.pop(player, None)
+
+
+class GameStateDecoder():
+    def __init__(self):
+        """
+        Client side: rebuilds the full view from keyframes and deltas
+        """
+        self.state: dict = None
+        self.seq: int = None
+
+    def apply(self, message: dict) -> dict:
+        """
+        :return: the full view in the same form as a JSON decoded getGameData, or None while waiting for a
+                 keyframe after a missed message
+        """
+        if message.get('keyframe'):
+            self.seq = message['seq']
+            self.state = message['state']
+            return self.state
+
+        if self.state is None or message['seq'] != self.seq + 1:
+            # Missed a message, the view is unknown until the next keyframe
+            self.state = None
+            return None
+
+        self.seq = message['seq']
+        state = dict(self.state)
+        added, removed = message.get('added', {}), message.get('removed', {})
+        for key in SET_KEYS:
+            if key in added or key in removed:
+                locs = to_locs(state[key])
+                locs -= to_locs(removed.get(key, ()))
+                locs |= to_locs(added.get(key, ()))
+                state[key] = from_locs(locs)
+        state.update(message.get('changed', {}))
+        self.state = state
+        return state
@@ -1,12 +1,101 @@
-from pydantic import BaseModel, Field
+"""
+Models and parsers for inbound payloads. Every handler validates its payload through the parse_* functions:
+the fixed move and start tokens are matched on the raw bytes without decoding, JSON bodies are parsed and
+validated in one step by the model's compiled pydantic validator. The accepted values are spelled out once,
+by Moveset and the Start model, the bare token tables are derived from them
+"""
+
+from typing import Literal, get_args
+from pydantic import BaseModel, Field, field_validator
+from moveset import Moveset
 
 class NewPlayer(BaseModel):
     lobby_name: str = Field(..., min_length=1, max_length=20)
     team_name: str = Field(..., min_length=1, max_length=20)
     player_name: str = Field(..., min_length=1, max_length=20)
+    wire_format: str = Field('json', pattern=r'^(json|binary|msgpack)$')
 
 class Move(BaseModel):
-    move: str = Field(..., pattern=r'^(UP|DOWN|LEFT|RIGHT)$')
+    move: Moveset
+
+    @field_validator('move', mode='before')
+    @classmethod
+    def move_by_name(cls, value):
+        """
+        Moves are sent by name, e.g. "UP", the Moveset values are deltas
+        """
+        if isinstance(value, str) and value in Moveset.__members__:
+            return Moveset[value]
+        if isinstance(value, Moveset):
+            return value
+        raise ValueError(f"Invalid move: {value!r}")
 
 class Start(BaseModel):
-    start: str = Field(..., pattern=r'^(START)$')
+    start: Literal['START', 'STOP']
+
+class ProfileRequest(BaseModel):
+    lobby_name: str = Field(..., min_length=1, max_length=20)
+    turns: int = Field(10, ge=1, le=10000)
+    every: int = Field(1, ge=1)
+    cprofile: bool = False
+    stop: bool = False
+
+
+def literal_tokens(model: type[BaseModel], field: str) -> dict:
+    """
+    :return: {token : value} for each value of the model's Literal field, as bytes from the broker and as str
+             from local callers
+    """
+    values = get_args(model.model_fields[field].annotation)
+    return {token: value for value in values for token in (value, value.encode())}
+
+
+MOVE_TOKENS = {token: move for name, move in Moveset.__members__.items() for token in (name, name.encode())}
+START_TOKENS = literal_tokens(Start, 'start')
+
+
+def as_bytes(payload) -> bytes:
+    return payload.encode() if isinstance(payload, str) else payload
+
+
+def parse_new_player(payload) -> NewPlayer:
+    """
+    :raises ValueError: the payload is not a valid new_game body
+    """
+    return NewPlayer.model_validate_json(as_bytes(payload))
+
+
+def parse_move(payload) -> Moveset:
+    """
+    :param payload: a bare token like b'UP', or a JSON body like {"move": "UP"}
+    :raises ValueError: the payload is not a valid move
+    """
+    move = MOVE_TOKENS.get(payload)
+    if move is not None:
+        return move
+    payload = as_bytes(payload)
+    if payload[:1] != b'{':
+        raise ValueError(f"Invalid move: {payload.decode(errors='replace')}")
+    return Move.model_validate_json(payload).move
+
+
+def parse_start(payload) -> str:
+    """
+    :param payload: a bare token like b'START', or a JSON body like {"start": "START"}
+    :return: 'START' or 'STOP'
+    :raises ValueError: the payload is neither
+    """
+    command = START_TOKENS.get(payload)
+    if command is not None:
+        return command
+    payload = as_bytes(payload)
+    if payload[:1] != b'{':
+        raise ValueError(f"Invalid start command: {payload.decode(errors='replace')}")
+    return Start.model_validate_json(payload).start
+
+
+def parse_profile_request(payload) -> ProfileRequest:
+    """
+    :raises ValueError: the payload is not a valid admin/profile body
+    """
+    return ProfileRequest.model_validate_json(as_bytes(payload))
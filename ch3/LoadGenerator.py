@@ -0,0 +1,312 @@
+"""
+Load generator for the game server: N lobbies x M bot players over MQTT
+
+    python LoadGenerator.py --lobbies 100 --players 4 --rate 2 --duration 60
+
+Every bot joins through new_game and each lobby is started once its bots have joined. From then on every bot
+answers each game_state it receives with a random move, at most --rate moves a second. Lobbies whose game
+ends are replaced by a fresh lobby with --restart. Run it against the broker the server is connected to,
+e.g. a local mosquitto with the server started with BROKER_TLS=0. --processes splits the lobbies over
+several processes, each with its own --connections connections.
+
+Reported:
+    turn latency  - from the last move of a turn being sent to the first game_state of the next turn arriving
+    start latency - from START being sent to the first game_state arriving
+    throughput    - messages and bytes sent and received per second
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import ssl
+import time
+from contextlib import AsyncExitStack
+
+import aiomqtt
+from dotenv import load_dotenv
+
+MOVES = (b'UP', b'DOWN', b'LEFT', b'RIGHT')
+
+
+class BotLobby():
+    def __init__(self, index: int, prefix: str, num_players: int, num_teams: int):
+        """
+        One lobby of bots, renamed with a new generation every time it restarts
+        """
+        self.index = index
+        self.prefix = prefix
+        self.generation = 0
+        self.players = [f'b{index}_{p}' for p in range(num_players)]
+        self.teams = {player: f't{p % num_teams}' for p, player in enumerate(self.players)}
+        self.reset()
+
+    @property
+    def name(self) -> str:
+        return f'{self.prefix}{self.index}.{self.generation}'
+
+    def reset(self):
+        self.started_at = None # When START was sent, until the first game_state arrives
+        self.finished = False
+        self.turn = 0 # Latest turn any bot has seen a game_state for
+        self.bot_turns = dict.fromkeys(self.players, 0)
+        self.next_move_at = dict.fromkeys(self.players, 0.0)
+        self.moves_sent: dict[int, int] = {} # {turn : moves sent in answer to that turn's game_state}
+        self.last_move_at: dict[int, float] = {} # {turn : when its last move was sent}
+
+
+class LoadGenerator():
+    def __init__(self, num_lobbies: int, num_players: int, num_teams: int = 2, rate: float = 1.0,
+                 duration: float = 60.0, join_wait: float = 1.0, restart: bool = False, prefix: str = 'ld-',
+                 wire_format: str = 'json', qos: int = 0):
+        """
+        :param rate: moves per second per bot, 0 answers every game_state right away
+        :param duration: seconds to play for after the lobbies start
+        :param join_wait: seconds between a lobby's new_game messages and its START
+        :param restart: replace each lobby whose game ends with a new one
+        :param prefix: lobby name prefix, keep lobby names within the server's 20 characters
+        """
+        self.lobbies = [BotLobby(i, prefix, num_players, num_teams) for i in range(num_lobbies)]
+        self.rate = rate
+        self.duration = duration
+        self.join_wait = join_wait
+        self.restart = restart
+        self.wire_format = wire_format
+        self.qos = qos
+
+        self.by_name: dict[str, BotLobby] = {}
+        self.clients: dict[str, aiomqtt.Client] = {} # {lobby name : client publishing for it}
+        self.tasks: set[asyncio.Task] = set()
+        self.stopping = False
+        self.stats = {
+            'sent': 0, 'received': 0, 'bytes_sent': 0, 'bytes_received': 0,
+            'turn_latencies': [], 'start_latencies': [],
+            'timed_out_turns': 0, 'games_completed': 0, 'errors': 0, 'elapsed': 0.0,
+        }
+
+    async def publish(self, client, topic: str, payload: bytes):
+        await client.publish(topic, payload, qos=self.qos)
+        self.stats['sent'] += 1
+        self.stats['bytes_sent'] += len(payload)
+
+    def spawn(self, coroutine):
+        # Keeps a reference until the task is done, the event loop only holds weak ones
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def start_lobby(self, lobby: BotLobby, client):
+        name = lobby.name
+        self.by_name[name] = lobby
+        self.clients[name] = client
+        await client.subscribe(f'games/{name}/+/game_state')
+        await client.subscribe(f'games/{name}/lobby')
+        for player in lobby.players:
+            body = {'lobby_name': name, 'team_name': lobby.teams[player], 'player_name': player,
+                    'wire_format': self.wire_format}
+            await self.publish(client, 'new_game', json.dumps(body).encode())
+        await asyncio.sleep(self.join_wait)
+        lobby.started_at = time.perf_counter()
+        await self.publish(client, f'games/{name}/start', b'START')
+
+    async def restart_lobby(self, lobby: BotLobby):
+        client = self.clients.pop(lobby.name)
+        del self.by_name[lobby.name]
+        await client.unsubscribe(f'games/{lobby.name}/+/game_state')
+        await client.unsubscribe(f'games/{lobby.name}/lobby')
+        lobby.generation += 1
+        lobby.reset()
+        await self.start_lobby(lobby, client)
+
+    def on_message(self, topic: str, payload: bytes):
+        self.stats['received'] += 1
+        self.stats['bytes_received'] += len(payload)
+        levels = topic.split('/')
+        lobby = self.by_name.get(levels[1]) if len(levels) > 2 else None
+        if lobby is None or lobby.finished:
+            return
+        if levels[-1] == 'game_state':
+            self.on_game_state(lobby, levels[2])
+        elif levels[-1] == 'lobby':
+            self.on_lobby_message(lobby, payload)
+
+    def on_game_state(self, lobby: BotLobby, player: str):
+        now = time.perf_counter()
+        if player not in lobby.bot_turns:
+            return
+        turn = lobby.bot_turns[player] + 1
+        lobby.bot_turns[player] = turn
+
+        if turn > lobby.turn:
+            # First game_state of a new turn in this lobby
+            lobby.turn = turn
+            if lobby.started_at is not None:
+                self.stats['start_latencies'].append(now - lobby.started_at)
+                lobby.started_at = None
+            previous = lobby.last_move_at.pop(turn - 1, None)
+            if previous is not None:
+                self.stats['turn_latencies'].append(now - previous)
+            elif turn > 1:
+                # Resolved before every bot moved, e.g. by the server's turn timeout
+                self.stats['timed_out_turns'] += 1
+            lobby.moves_sent.pop(turn - 1, None)
+
+        delay = max(0.0, lobby.next_move_at[player] - now)
+        asyncio.get_running_loop().call_later(delay, self.send_move, lobby, lobby.generation, player, turn)
+
+    def send_move(self, lobby: BotLobby, generation: int, player: str, turn: int):
+        # Moves scheduled before a restart belong to the previous game
+        if lobby.finished or lobby.generation != generation:
+            return
+        now = time.perf_counter()
+        if self.rate > 0:
+            lobby.next_move_at[player] = now + 1 / self.rate
+        sent = lobby.moves_sent.get(turn, 0) + 1
+        lobby.moves_sent[turn] = sent
+        if sent == len(lobby.players):
+            lobby.last_move_at[turn] = now
+        self.spawn(self.publish(self.clients[lobby.name], f'games/{lobby.name}/{player}/move', random.choice(MOVES)))
+
+    def on_lobby_message(self, lobby: BotLobby, payload: bytes):
+        message = payload.decode(errors='replace')
+        if message.startswith('Game Over'):
+            lobby.finished = True
+            self.stats['games_completed'] += 1
+            if self.restart and not self.stopping:
+                self.spawn(self.restart_lobby(lobby))
+        elif message.startswith('Error'):
+            self.stats['errors'] += 1
+
+    async def read(self, client):
+        async for message in client.messages:
+            payload = message.payload
+            if isinstance(payload, str):
+                payload = payload.encode()
+            self.on_message(str(message.topic), bytes(payload))
+
+    async def run(self, clients: list) -> dict:
+        """
+        Plays every lobby on the given connected clients, round robin, for the configured duration
+        :return: the stats
+        """
+        readers = [asyncio.create_task(self.read(client)) for client in clients]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.start_lobby(lobby, clients[lobby.index % len(clients)])
+                                   for lobby in self.lobbies))
+            deadline = start + self.join_wait + self.duration
+            while time.perf_counter() < deadline and (self.restart or not all(l.finished for l in self.lobbies)):
+                await asyncio.sleep(0.1)
+            self.stopping = True
+
+            # Leave no lobbies behind on the server
+            for name, lobby in list(self.by_name.items()):
+                if not lobby.finished:
+                    lobby.finished = True
+                    await self.publish(self.clients[name], f'games/{name}/start', b'STOP')
+        finally:
+            self.stats['elapsed'] = time.perf_counter() - start
+            for reader in readers:
+                reader.cancel()
+        return self.stats
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    # Nearest rank
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def merge_stats(results: list[dict]) -> dict:
+    merged = {}
+    for stats in results:
+        for key, value in stats.items():
+            if key == 'elapsed':
+                merged[key] = max(merged.get(key, 0.0), value)
+            elif isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def summarize(stats: dict) -> dict:
+    elapsed = stats['elapsed'] or 1.0
+    summary = {
+        'elapsed_s': elapsed,
+        'sent_per_s': stats['sent'] / elapsed,
+        'received_per_s': stats['received'] / elapsed,
+        'bytes_sent_per_s': stats['bytes_sent'] / elapsed,
+        'bytes_received_per_s': stats['bytes_received'] / elapsed,
+        'turns': len(stats['turn_latencies']),
+        'turns_per_s': len(stats['turn_latencies']) / elapsed,
+        'timed_out_turns': stats['timed_out_turns'],
+        'games_completed': stats['games_completed'],
+        'errors': stats['errors'],
+    }
+    for name in ('turn', 'start'):
+        values = stats[f'{name}_latencies']
+        for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0)):
+            summary[f'{name}_latency_{label}_ms'] = percentile(values, fraction) * 1e3
+    return summary
+
+
+async def run_generator(options: dict, process_index: int, num_lobbies: int) -> dict:
+    generator = LoadGenerator(num_lobbies, options['players'], options['teams'], options['rate'],
+                              options['duration'], options['join_wait'], options['restart'],
+                              f'ld{process_index}-', options['wire_format'], options['qos'])
+    tls_context = ssl.create_default_context() if options['tls'] else None
+    async with AsyncExitStack() as stack:
+        clients = [await stack.enter_async_context(aiomqtt.Client(
+                       options['host'], options['port'], username=options['username'], password=options['password'],
+                       identifier=f'LoadGenerator-{os.getpid()}-{c}', protocol=aiomqtt.ProtocolVersion.V5,
+                       tls_context=tls_context))
+                   for c in range(options['connections'])]
+        return await generator.run(clients)
+
+
+def run_process(options: dict, process_index: int, num_lobbies: int) -> dict:
+    return asyncio.run(run_generator(options, process_index, num_lobbies))
+
+
+if __name__ == '__main__':
+    load_dotenv(dotenv_path='./credentials.env')
+
+    parser = argparse.ArgumentParser(description='Simulate lobbies of bot players against the game server')
+    parser.add_argument('--lobbies', type=int, default=10)
+    parser.add_argument('--players', type=int, default=4, help='bots per lobby')
+    parser.add_argument('--teams', type=int, default=2, help='teams per lobby')
+    parser.add_argument('--rate', type=float, default=1.0, help='moves per second per bot, 0 for as fast as turns resolve')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to play for')
+    parser.add_argument('--join-wait', type=float, default=1.0, help='seconds between joining a lobby and starting it')
+    parser.add_argument('--restart', action='store_true', help='replace lobbies whose game ended')
+    parser.add_argument('--wire-format', default='json', choices=('json', 'binary', 'msgpack'))
+    parser.add_argument('--qos', type=int, default=0, choices=(0, 1, 2))
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--connections', type=int, default=1, help='broker connections per process')
+    parser.add_argument('--host', default=os.environ.get('BROKER_ADDRESS', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('BROKER_PORT', 1883)))
+    parser.add_argument('--tls', action='store_true', help='connect with TLS, e.g. to HiveMQ Cloud')
+    parser.add_argument('--json', metavar='PATH', help='also write the summary as JSON')
+    args = parser.parse_args()
+
+    options = vars(args) | {'username': os.environ.get('USER_NAME'), 'password': os.environ.get('PASSWORD')}
+    # Spread the lobbies over the processes, the first ones take the remainder
+    shares = [args.lobbies // args.processes + (p < args.lobbies % args.processes) for p in range(args.processes)]
+    if args.processes == 1:
+        results = [run_process(options, 0, shares[0])]
+    else:
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.starmap(run_process, [(options, p, shares[p]) for p in range(args.processes)])
+
+    summary = summarize(merge_stats(results))
+    for key, value in summary.items():
+        print(f'{key:<28} {value:12.2f}' if isinstance(value, float) else f'{key:<28} {value:12d}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,176 @@
+"""
+Opt-in profiling of one lobby's turn pipeline
+
+A LobbyProfiler times each phase of resolve_turn for a number of turns and can run cProfile over every
+n-th of them. When the turns are done it writes the cProfile stats as a .prof file (pstats, snakeviz) and
+as collapsed stacks (flamegraph.pl, speedscope), and returns a summary of the phase timings.
+cProfile records caller/callee edges rather than whole stacks, so the collapsed stacks split each
+function's time over the paths leading to it in proportion to the calls along each edge.
+"""
+
+import cProfile
+import os
+import pstats
+import time
+from contextlib import nullcontext
+
+# Returned by phase() for lobbies nobody is profiling
+NULL_PHASE = nullcontext()
+
+# Collapsed stacks deeper than this, or with less self time than this in seconds, are left out
+MAX_DEPTH = 64
+MIN_SECONDS = 1e-6
+
+
+class PhaseTimer():
+    def __init__(self, profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class LobbyProfiler():
+    def __init__(self, lobby_name: str, turns: int = 10, every: int = 1, cprofile: bool = False,
+                 output_dir: str = 'profiles'):
+        """
+        :param turns: number of turns to profile
+        :param every: run cProfile on every n-th profiled turn, phase timers cover every turn
+        :param cprofile: whether to run cProfile at all
+        :param output_dir: where the .prof and .collapsed files go
+        """
+        self.lobby_name = lobby_name
+        self.turns = turns
+        self.every = every
+        self.cprofile = cprofile
+        self.output_dir = output_dir
+        self.turns_done = 0
+        self.phases: dict[str, list] = {} # {phase : [count, total seconds, max seconds]}
+        self.__timers: dict[str, PhaseTimer] = {}
+        self.__profile = cProfile.Profile() if cprofile else None
+        self.__profiled_turns = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.turns_done >= self.turns
+
+    def phase(self, name: str) -> PhaseTimer:
+        timer = self.__timers.get(name)
+        if timer is None:
+            timer = self.__timers[name] = PhaseTimer(self, name)
+        return timer
+
+    def record(self, name: str, seconds: float):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+    def run_turn(self, resolve):
+        """
+        Calls resolve(), timing it as the 'turn' phase and under cProfile when this turn is sampled
+        """
+        sampled = self.__profile is not None and self.turns_done % self.every == 0
+        start = time.perf_counter()
+        if sampled:
+            self.__profile.enable()
+        try:
+            resolve()
+        finally:
+            if sampled:
+                self.__profile.disable()
+                self.__profiled_turns += 1
+            self.record('turn', time.perf_counter() - start)
+            self.turns_done += 1
+
+    def report(self) -> dict:
+        """
+        Writes the cProfile output, if any
+        :return: phase timings in milliseconds and the paths of the written files
+        """
+        report = {
+            'lobby_name': self.lobby_name,
+            'turns': self.turns_done,
+            'phases': {name: {'count': count, 'total_ms': total * 1e3, 'mean_ms': total / count * 1e3, 'max_ms': most * 1e3}
+                       for name, (count, total, most) in self.phases.items()},
+        }
+        if self.__profiled_turns:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f'{self.lobby_name}-{int(time.time())}')
+            self.__profile.dump_stats(base + '.prof')
+            with open(base + '.collapsed', 'w') as f:
+                for stack, seconds in collapsed_stacks(pstats.Stats(self.__profile).stats):
+                    f.write(f'{stack} {round(seconds * 1e6)}\n')
+            report['profiled_turns'] = self.__profiled_turns
+            report['profile'] = base + '.prof'
+            report['collapsed'] = base + '.collapsed'
+        return report
+
+
+def phase(profiler: LobbyProfiler, name: str):
+    """
+    :return: a context timing the phase, or one doing nothing when profiler is None
+    """
+    return NULL_PHASE if profiler is None else profiler.phase(name)
+
+
+def function_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == '~':
+        # Builtins, e.g. <method 'append' of 'list' objects>
+        return name.replace(';', ',').replace(' ', '_')
+    return f'{os.path.basename(filename)}:{name}:{line}'
+
+
+def collapsed_stacks(stats: dict) -> list[tuple[str, float]]:
+    """
+    :param stats: pstats.Stats(...).stats, {func : (primitive calls, calls, self time, total time, callers)}
+    :return: [(semicolon separated stack, self seconds)], in microseconds when written out
+    """
+    callees: dict[tuple, list] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    # Functions only called from a cycle no root reaches, such as a recursive entry point, start stacks of
+    # their own, the costliest first
+    reached = set(roots)
+    pending = list(roots)
+    for func in sorted(stats, key=lambda func: -stats[func][3]):
+        if func not in reached:
+            roots.append(func)
+            reached.add(func)
+            pending.append(func)
+        while pending:
+            for callee, _ in callees.get(pending.pop(), ()):
+                if callee not in reached:
+                    reached.add(callee)
+                    pending.append(callee)
+
+    stacks: dict[str, float] = {}
+    def walk(func, path, labels, fraction):
+        _, _, self_time, total_time, _ = stats[func]
+        if total_time * fraction < MIN_SECONDS:
+            return
+        seconds = self_time * fraction
+        if seconds >= MIN_SECONDS:
+            stack = ';'.join(labels)
+            stacks[stack] = stacks.get(stack, 0.0) + seconds
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats[callee][3]
+            if callee in path or callee_total <= 0:
+                continue
+            walk(callee, path | {callee}, labels + [function_label(callee)], min(1.0, edge_time * fraction / callee_total))
+
+    for root in roots:
+        walk(root, {root}, [function_label(root)], 1.0)
+    return sorted(stacks.items())
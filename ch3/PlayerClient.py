@@ -6,11 +6,15 @@ import paho.mqtt.client as paho
 from paho import mqtt
 from InputTypes import NewPlayer
 from game import Game
+from GameStateDelta import GameStateDecoder
+import WireFormat
 import time
 
 
 game_over = False
 suggestion_received = False
+state_decoders = {} # {player_name : GameStateDecoder} for servers publishing game_state deltas
+WIRE_FORMAT = 'json' # requested wire format, the lobby only uses it if every player asks for it
 
 # setting callbacks for different events to see if it works, print the message etc.
 def on_connect(client, userdata, flags, rc, properties=None):
@@ -61,6 +65,13 @@ def on_message(client, userdata, msg):
 
     global suggestion_received
     print("message: " + msg.topic + " " + str(msg.qos) + " " + str(msg.payload))
+    if msg.topic.endswith("/game_state"):
+        message_content = WireFormat.decode_game_state(msg.payload)
+        print(f"Game state: {decode_game_state(msg.topic, message_content)}")
+        return
+    if msg.topic.endswith("/scores"):
+        print(f"Scores: {WireFormat.decode_scores(msg.payload)}")
+        return
     message_content = json.loads(msg.payload.decode())
     if "Game Over" in message_content:
         game_over = True
@@ -70,6 +81,17 @@ def on_message(client, userdata, msg):
 
 
 
+def decode_game_state(topic, message_content):
+    """
+        Returns the full game_state view of a game_state message, rebuilding it when the server sends deltas
+        :return: the view as a dict, or None until a keyframe arrives after a missed delta
+    """
+    if 'seq' not in message_content:
+        return message_content
+    player = topic.split("/")[2]
+    return state_decoders.setdefault(player, GameStateDecoder()).apply(message_content)
+
+
 def get_user_direction(player, client, lobby_name, teammate_topic):
     global suggestion_received
     suggestion_received = False  # Ensure the flag is reset at the start of the function
@@ -159,7 +181,8 @@ if __name__ == '__main__':
         player, team = get_player_names()
         client.publish(topic = "new_game", payload = json.dumps({'lobby_name':lobby_name,
                                             'team_name':team,
-                                            'player_name' : player}))
+                                            'player_name' : player,
+                                            'wire_format' : WIRE_FORMAT}))
 
     time.sleep(5) # Wait a second to resolve game start
     client.publish(f"games/{lobby_name}/start", "START")
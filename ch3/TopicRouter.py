@@ -0,0 +1,88 @@
+import re
+
+
+class TopicRouter():
+    def __init__(self):
+        """
+        Resolves topics to handlers using MQTT subscription patterns. All routes are compiled into a single
+        regular expression, so a topic is matched in one pass without splitting it, and the '+' and '#'
+        wildcards are captured as the handler's parameters
+        """
+        self.patterns: list[str] = []
+        self.handlers: list = []
+        self.route_counts: list[int] = []
+        self.unmatched = 0
+        self.__params: dict[int, tuple[int, tuple[int, ...]]] = {} # {marker group : (route, parameter groups)}
+        self.__regex = None
+
+    def add(self, pattern: str, handler):
+        """
+        :param pattern: MQTT subscription pattern, e.g. 'games/+/+/move'
+        :param handler: called as handler(client, *wildcard levels, payload)
+        """
+        self.patterns.append(pattern)
+        self.handlers.append(handler)
+        self.route_counts.append(0)
+        self.__regex = None
+        return self
+
+    def compile(self):
+        alternatives = []
+        group = 0
+        self.__params = {}
+        for route, pattern in enumerate(self.patterns):
+            levels = []
+            params = []
+            for i, level in enumerate(pattern.split('/')):
+                if level == '+':
+                    # A lobby or player name is never empty
+                    levels.append('([^/]+)')
+                elif level == '#':
+                    assert i == pattern.count('/'), f"'#' must be the last level of {pattern}"
+                    levels.append('(.*)')
+                else:
+                    levels.append(re.escape(level))
+                    continue
+                group += 1
+                params.append(group)
+            # The empty group after each alternative tells which route matched
+            group += 1
+            alternatives.append('/'.join(levels) + '()')
+            self.__params[group] = (route, tuple(params))
+        self.__regex = re.compile('|'.join(alternatives))
+
+    def match(self, topic: str):
+        """
+        :return: (route index, wildcard levels) for the first matching route, or None
+        """
+        if self.__regex is None:
+            self.compile()
+        m = self.__regex.fullmatch(topic)
+        if m is None:
+            return None
+        route, params = self.__params[m.lastindex]
+        if not params:
+            return route, ()
+        if len(params) == 1:
+            return route, (m.group(params[0]),)
+        return route, m.group(*params)
+
+    def dispatch(self, client, topic: str, payload) -> bool:
+        """
+        Calls the handler of the topic's route
+        :return: whether a route matched
+        """
+        match = self.match(topic)
+        if match is None:
+            self.unmatched += 1
+            return False
+        route, params = match
+        self.route_counts[route] += 1
+        self.handlers[route](client, *params, payload)
+        return True
+
+    def counts(self) -> dict[str, int]:
+        """
+        :return: messages dispatched per route pattern
+        """
+        return dict(zip(self.patterns, self.route_counts))
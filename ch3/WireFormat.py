@@ -0,0 +1,134 @@
+"""
+Encoders and decoders for server to client payloads, shared by GameClient and PlayerClient
+
+Formats:
+    json    - json.dumps of the dict, the default
+    binary  - fixed struct layout, all integers little-endian:
+                game_state: MAGIC, GAME_STATE, currentPosition as 2 x uint16,
+                            then for each of POSITION_KEYS a uint16 count followed by count x (uint16 x, uint16 y),
+                            then teammateNames as a uint8 count followed by count x (uint8 length, utf-8 bytes)
+                scores:     MAGIC, SCORES, uint8 count, then count x (uint8 length, utf-8 team name, int32 score)
+    msgpack - msgpack of the dict, only offered when the msgpack package is installed
+Decoders detect the format from the first byte, so clients do not need to know what the lobby negotiated.
+"""
+
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = 0xB1
+GAME_STATE = 1
+SCORES = 2
+
+POSITION_KEYS = ('teammatePositions', 'enemyPositions', 'coin1', 'coin2', 'coin3', 'walls')
+
+WIRE_FORMATS = ('json', 'binary', 'msgpack') if msgpack is not None else ('json', 'binary')
+
+HEADER = struct.Struct('<BBHH')
+COUNT = struct.Struct('<H')
+SCORE = struct.Struct('<i')
+
+
+def negotiate(current: str, requested: str) -> str:
+    """
+    :param current: format the lobby agreed on so far, None for an empty lobby
+    :param requested: format a joining player asked for
+    :return: the lobby's format, a lobby only leaves json if every player asked for the same format
+    """
+    if requested not in WIRE_FORMATS:
+        requested = 'json'
+    if current is None or current == requested:
+        return requested
+    return 'json'
+
+
+def encode_name(name: str) -> bytes:
+    data = name.encode()
+    return bytes((len(data),)) + data
+
+
+def decode_name(payload: bytes, offset: int) -> tuple[str, int]:
+    length = payload[offset]
+    return payload[offset+1:offset+1+length].decode(), offset+1+length
+
+
+def encode_game_state(game_data: dict, wire_format: str = 'json'):
+    if wire_format == 'binary':
+        x, y = game_data['currentPosition']
+        parts = [HEADER.pack(MAGIC, GAME_STATE, x, y)]
+        for key in POSITION_KEYS:
+            positions = game_data[key]
+            parts.append(COUNT.pack(len(positions)))
+            parts.append(struct.pack(f'<{2*len(positions)}H', *(c for loc in positions for c in loc)))
+        names = game_data['teammateNames']
+        parts.append(bytes((len(names),)))
+        parts.extend(encode_name(name) for name in names)
+        return b''.join(parts)
+    if wire_format == 'msgpack':
+        return msgpack.packb(game_data)
+    return json.dumps(game_data)
+
+
+def decode_game_state(payload: bytes) -> dict:
+    """
+    :return: the game_state dict, positions as [x, y] lists like a JSON decoded payload
+    """
+    if payload[:1] == bytes((MAGIC,)):
+        _, kind, x, y = HEADER.unpack_from(payload)
+        assert kind == GAME_STATE
+        game_data = {'currentPosition': [x, y]}
+        offset = HEADER.size
+        for key in POSITION_KEYS:
+            count, = COUNT.unpack_from(payload, offset)
+            offset += COUNT.size
+            coords = struct.unpack_from(f'<{2*count}H', payload, offset)
+            offset += 4*count
+            game_data[key] = [list(coords[i:i+2]) for i in range(0, 2*count, 2)]
+        names = []
+        count, offset = payload[offset], offset + 1
+        for _ in range(count):
+            name, offset = decode_name(payload, offset)
+            names.append(name)
+        game_data['teammateNames'] = names
+        return game_data
+    return decode_payload(payload)
+
+
+def encode_scores(scores: dict[str, int], wire_format: str = 'json'):
+    if wire_format == 'binary':
+        parts = [bytes((MAGIC, SCORES, len(scores)))]
+        for team, score in scores.items():
+            parts.append(encode_name(team))
+            parts.append(SCORE.pack(score))
+        return b''.join(parts)
+    if wire_format == 'msgpack':
+        return msgpack.packb(scores)
+    return json.dumps(scores)
+
+
+def decode_scores(payload: bytes) -> dict[str, int]:
+    if payload[:1] == bytes((MAGIC,)):
+        assert payload[1] == SCORES
+        scores = {}
+        offset = 3
+        for _ in range(payload[2]):
+            team, offset = decode_name(payload, offset)
+            scores[team], = SCORE.unpack_from(payload, offset)
+            offset += SCORE.size
+        return scores
+    return decode_payload(payload)
+
+
+def decode_payload(payload: bytes):
+    """
+    Decodes a json or msgpack payload
+    """
+    if payload[:1] in (b'{', b'[', b'"'):
+        return json.loads(payload)
+    if msgpack is None:
+        raise ValueError('Received a msgpack payload but msgpack is not installed')
+    return msgpack.unpackb(payload)
@@ -0,0 +1,115 @@
+"""
+NumPy-backed storage engine for Map
+"""
+
+import numpy as np
+from map import Map, MapView
+from player import Player
+from gameItems import *
+
+# Cell kinds stored in the int8 grid
+EMPTY = 0
+WALL = 1
+COIN1 = 2
+COIN2 = 3
+COIN3 = 4
+PLAYER = 5
+
+
+class ArrayMap(Map):
+    """
+    Drop-in replacement for Map that keeps the board as an int8 array of cell kinds.
+    Players are the only stateful items, so they live in a side table keyed by location.
+    """
+    ITEMS = (None, Wall(), Coin1(), Coin2(), Coin3())
+    KINDS = {Wall: WALL, Coin1: COIN1, Coin2: COIN2, Coin3: COIN3}
+    NAMES = ('None', 'Wall', 'Coin1', 'Coin2', 'Coin3')
+
+    @property
+    def kinds(self) -> np.ndarray:
+        """
+        :return: read-only (height, width) int8 array of cell kinds
+        """
+        return self.__readOnlyKinds
+
+    @property
+    def players(self) -> dict[tuple[int, int], Player]:
+        """
+        :return: copy of the side table mapping locations to players
+        """
+        return dict(self.__players)
+
+    def playerAt(self, loc: tuple[int, int]) -> Player:
+        return self.__players.get(loc)
+
+    @property
+    def map(self) -> MapView:
+        """
+        :return: zero-copy read-only view of the live grid
+        """
+        return MapView(self.height, self.width, self.__getRow, self._getCell)
+
+    def snapshot(self) -> MapView:
+        """
+        Snapshot of the grid. Copying the int8 kind array is a single memcpy of height*width bytes,
+        so unlike the list backend no copy-on-write bookkeeping is needed.
+        :return: read-only view that is isolated from later changes to the map
+        """
+        kinds = self.__kinds.copy()
+        players = dict(self.__players)
+        getCell = lambda x, y: players[(x, y)] if kinds[x, y] == PLAYER else ArrayMap.ITEMS[kinds[x, y]]
+        getRow = lambda x: tuple(getCell(x, y) for y in range(self.width))
+        return MapView(self.height, self.width, getRow, getCell)
+
+    def __getRow(self, x: int) -> tuple:
+        return tuple(self.__players[(x, y)] if kind == PLAYER else ArrayMap.ITEMS[kind]
+                     for y, kind in enumerate(self.__kinds[x].tolist()))
+
+    def __repr__(self):
+        result = []
+        for x, row in enumerate(self.__kinds.tolist()):
+            row_str = []
+            for y, kind in enumerate(row):
+                row_str.append(self.__players[(x, y)].name if kind == PLAYER else ArrayMap.NAMES[kind])
+            result.append('\t'.join(row_str))
+
+        return '\n'.join(result)
+
+    def _allocate(self, height: int, width: int):
+        self.__kinds = np.zeros((height, width), dtype=np.int8)
+        self.__readOnlyKinds = self.__kinds.view()
+        self.__readOnlyKinds.flags.writeable = False
+        self.__players: dict[tuple[int, int], Player] = {}
+
+    def _getCell(self, x: int, y: int):
+        kind = self.__kinds[x, y]
+        if kind == PLAYER:
+            return self.__players[(x, y)]
+        return ArrayMap.ITEMS[kind]
+
+    def _setCell(self, x: int, y: int, item: object):
+        if self.__kinds[x, y] == PLAYER:
+            del self.__players[(x, y)]
+
+        if item is None:
+            self.__kinds[x, y] = EMPTY
+        elif isinstance(item, Player):
+            self.__kinds[x, y] = PLAYER
+            self.__players[(x, y)] = item
+        else:
+            self.__kinds[x, y] = ArrayMap.KINDS[type(item)]
+
+    def _moveCells(self, oldLocs: list[tuple[int, int]], newLocs: list[tuple[int, int]]):
+        # Two fancy-index writes for the grid, only the player side table is updated per player
+        players = self.__players
+        movers = [players.pop(loc) for loc in oldLocs]
+        olds, news = np.array(oldLocs), np.array(newLocs)
+        self.__kinds[olds[:, 0], olds[:, 1]] = EMPTY
+        self.__kinds[news[:, 0], news[:, 1]] = PLAYER
+        players.update(zip(newLocs, movers))
+
+
+if __name__ == '__main__':
+    m = ArrayMap(10, 10, [Player('Charles', None), Player('James', None)])
+    print(m)
+    print(m.kinds)
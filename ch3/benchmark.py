@@ -0,0 +1,271 @@
+"""
+Benchmarks for the game engine hot paths
+
+Run everything and save the results:      python benchmark.py --save baseline
+Compare a later run against the baseline: python benchmark.py --compare baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Iterator
+from game import Game
+from map import Map
+from arrayMap import ArrayMap
+from moveset import Moveset
+from player import Player
+from team import Team
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+MAP_TYPES = (Map, ArrayMap)
+
+# benchMemory of the list-backed Map in the tree before the engine changes (one item instance per cell, no
+# __slots__), 1000x1000 with 100 players on seed 0. Memory results are reported against it
+ORIGINAL_BYTES_PER_CELL = 17.84
+
+
+def timeIt(fn: Callable[[], object], repeat: int = 5) -> float:
+    """
+    :return: best seconds per call of fn over repeat runs, each run long enough to be timed reliably
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def makePlayers(numPlayers: int, numTeams: int = 2) -> dict[str, list[str]]:
+    return {f'Team{t}': [f'Player{t}_{p}' for p in range(t, numPlayers, numTeams)] for t in range(numTeams)}
+
+
+def benchMapGeneration() -> Iterator[tuple[str, float]]:
+    """
+    Map.__init__ (and so __fillMap) across board sizes and wall densities
+    """
+    for mapType in MAP_TYPES:
+        for size in (10, 100, 300):
+            cells = [(x, y) for x in range(size) for y in range(size)]
+            for density in (0.1, 0.3):
+                random.seed(0)
+                wallChoices = random.sample(cells, int(density * len(cells)))
+                players = [Player(f'Player{i}', None) for i in range(4)]
+                yield (f'mapGeneration[{mapType.__name__},{size},{density}]',
+                       timeIt(lambda: mapType(size, size, players, wallChoices), repeat=3))
+
+
+def benchMovePlayer() -> Iterator[tuple[str, float]]:
+    """
+    Game.movePlayer, seconds per move
+    """
+    for mapType in MAP_TYPES:
+        random.seed(0)
+        game = Game(makePlayers(4), 100, 100, mapType=mapType)
+        moves = [(playerName, random.choice(list(Moveset))) for _ in range(250) for playerName in game.all_players]
+
+        def run():
+            for playerName, move in moves:
+                game.movePlayer(playerName, move)
+        yield f'movePlayer[{mapType.__name__}]', timeIt(run) / len(moves)
+
+
+def benchApplyMoves() -> Iterator[tuple[str, float]]:
+    """
+    Game.applyMoves in both modes for 20, 200 and 1000 player lobbies, seconds per turn
+    """
+    for mapType in MAP_TYPES:
+        for numPlayers, size in ((20, 100), (200, 100), (1000, 300)):
+            for sequential in (True, False):
+                random.seed(0)
+                game = Game(makePlayers(numPlayers), size, size, mapType=mapType)
+                turns = [[(playerName, random.choice(list(Moveset))) for playerName in game.all_players] for _ in range(20)]
+
+                def run():
+                    for moves in turns:
+                        game.applyMoves(moves, sequential)
+                mode = 'sequential' if sequential else 'simultaneous'
+                yield f'applyMoves[{mapType.__name__},{mode},players={numPlayers}]', timeIt(run, repeat=3) / len(turns)
+
+
+def benchGameData() -> Iterator[tuple[str, float]]:
+    """
+    Game.getGameData for one player, and every player's view both through Game.getAllGameData and through a
+    getGameData call per player, at different vision radii. The lobbies are the server's default (4 players on
+    a 10x10 map), a sparse one whose vision windows rarely overlap and a 20 player one on a 100x100 map
+    """
+    for mapType in MAP_TYPES:
+        for numPlayers, size in ((4, 10), (4, 100), (20, 100)):
+            random.seed(0)
+            game = Game(makePlayers(numPlayers), size, size, mapType=mapType)
+            playerNames = list(game.all_players)
+            for radius in (2, 5, 10):
+                lobby = f'{mapType.__name__},r={radius},players={numPlayers},size={size}'
+                if numPlayers == 20:
+                    yield (f'getGameData[{mapType.__name__},r={radius}]',
+                           timeIt(lambda: game.getGameData('Player0_0', radius)))
+                yield f'getAllGameData[{lobby}]', timeIt(lambda: game.getAllGameData(radius))
+                yield (f'perPlayerGameData[{lobby}]',
+                       timeIt(lambda: {playerName: game.getGameData(playerName, radius) for playerName in playerNames}))
+
+
+def benchRepr() -> Iterator[tuple[str, float]]:
+    """
+    Map.__repr__, which the server prints after every turn
+    """
+    for mapType in MAP_TYPES:
+        for size in (10, 100):
+            random.seed(0)
+            game = Game(makePlayers(4), size, size, mapType=mapType)
+            yield f'repr[{mapType.__name__},{size}]', timeIt(lambda: repr(game.map))
+
+
+def benchSerialization() -> Iterator[tuple[str, float]]:
+    """
+    JSON encoding of one turn's game_state and scores messages, as published by GameClient.player_move
+    """
+    random.seed(0)
+    game = Game(makePlayers(20), 100, 100)
+    for radius in (2, 5):
+        allGameData = game.getAllGameData(radius)
+
+        def run():
+            for gameData in allGameData.values():
+                json.dumps(gameData)
+            json.dumps(game.getScores())
+        yield f'serializeTurn[r={radius},players=20]', timeIt(run)
+
+
+def benchValidation() -> Iterator[tuple[str, float]]:
+    """
+    Inbound payload validation, the InputTypes parsers against the previous json.loads + NewPlayer(**...)
+    and decode + dict lookup paths
+    """
+    # Imported here so the engine benchmarks run without pydantic installed
+    from InputTypes import NewPlayer, parse_new_player, parse_move
+
+    newGame = json.dumps({'lobby_name': 'Lobby', 'team_name': 'Team', 'player_name': 'Player'}).encode()
+    yield 'newGame[pydantic kwargs]', timeIt(lambda: NewPlayer(**json.loads(newGame)))
+    yield 'newGame[parse_new_player]', timeIt(lambda: parse_new_player(newGame))
+
+    moves = {move.name: move for move in Moveset}
+    yield 'move[decode+lookup]', timeIt(lambda: moves[b'RIGHT'.decode()])
+    yield 'move[parse_move]', timeIt(lambda: parse_move(b'RIGHT'))
+    yield 'move[parse_move json]', timeIt(lambda: parse_move(b'{"move": "RIGHT"}'))
+
+
+BENCHMARKS = {
+    'mapGeneration': benchMapGeneration,
+    'movePlayer': benchMovePlayer,
+    'applyMoves': benchApplyMoves,
+    'gameData': benchGameData,
+    'repr': benchRepr,
+    'serialization': benchSerialization,
+    'validation': benchValidation,
+}
+
+
+def benchMemory(size: int = 1000, numPlayers: int = 100, mapType: type[Map] = Map) -> dict:
+    """
+    Measures the memory held by a freshly generated size x size map
+    :return: {'map': mapType name, 'size': size, 'bytes': total bytes, 'bytesPerCell': bytes per cell}
+    """
+    random.seed(0)
+    team = Team('Team')
+    players = [Player(f'Player{i}', team) for i in range(numPlayers)]
+
+    gc.collect()
+    tracemalloc.start()
+    m = mapType(size, size, players)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del m
+
+    return {'map': mapType.__name__, 'size': size, 'bytes': used, 'bytesPerCell': used / (size * size)}
+
+
+def memoryResults(size: int = 1000, numPlayers: int = 100) -> dict[str, float]:
+    """
+    benchMemory of every backend, so the memory is saved and compared alongside the timings
+    :return: {'memory[mapType,size]': bytes per cell}
+    """
+    results = {}
+    for mapType in MAP_TYPES:
+        result = benchMemory(size, numPlayers, mapType)
+        name = f'memory[{mapType.__name__},{size}]'
+        results[name] = result['bytesPerCell']
+        print(f'{name:<50} {formatResult(name, results[name])} '
+              f'({results[name] / ORIGINAL_BYTES_PER_CELL:.2f}x the original Map)')
+    return results
+
+
+def formatResult(name: str, value: float) -> str:
+    if name.startswith('memory['):
+        return f'{value:12.2f} B/cell'
+    return f'{value*1e6:12.2f} us'
+
+
+def runBenchmarks(groups: list[str]) -> dict[str, float]:
+    """
+    :return: {benchmark name: seconds per operation}
+    """
+    results = {}
+    for group in groups:
+        for name, seconds in BENCHMARKS[group]():
+            results[name] = seconds
+            print(f'{name:<50} {formatResult(name, seconds)}')
+    return results
+
+
+def compareResults(baseline: dict[str, float], results: dict[str, float], threshold: float) -> list[str]:
+    """
+    :param threshold: relative slowdown, or growth in memory, that counts as a regression, e.g. 0.1 for 10%
+    :return: names of the benchmarks that regressed
+    """
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        change = value / baseline[name] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<50} {formatResult(name, baseline[name])} -> {formatResult(name, value)} {change:+7.1%}{flag}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the game engine hot paths')
+    parser.add_argument('groups', nargs='*', metavar='GROUP',
+                        help=f"benchmark groups to run, all by default: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--save', metavar='NAME', help=f'store the results as NAME.json in {RESULTS_DIR}')
+    parser.add_argument('--compare', metavar='NAME', help='compare against results stored with --save NAME')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown reported as a regression')
+    parser.add_argument('--memory', action='store_true',
+                        help='also measure the memory of a 1000x1000 map, saved and compared with the timings')
+    args = parser.parse_args()
+    for group in args.groups:
+        if group not in BENCHMARKS:
+            parser.error(f'unknown benchmark group {group}')
+
+    results = runBenchmarks(args.groups or list(BENCHMARKS))
+
+    if args.memory:
+        results.update(memoryResults())
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(os.path.join(RESULTS_DIR, f'{args.save}.json'), 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        print(f'\nCompared to {args.compare}:')
+        if compareResults(baseline, results, args.threshold):
+            sys.exit(1)
@@ -2,17 +2,34 @@
 Author: Charles Lee
 """
 
+from bisect import bisect_left, bisect_right
+from itertools import chain
+import numpy as np
 from map import Map
+from arrayMap import ArrayMap, EMPTY, WALL, COIN1, COIN2, COIN3, PLAYER
 from moveset import Moveset
 from player import Player
+from playerIndex import PlayerIndex
 from team import Team
 from gameItems import *
 import random
+from typing import Callable, Hashable, Iterable
 
 class Game:
-    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10):
+    # gameData key for each item kind stored in an ArrayMap
+    ITEM_KEYS = {COIN1: 'coin1', COIN2: 'coin2', COIN3: 'coin3', WALL: 'walls'}
+    # The same keys indexed by cell kind, and by item type for list-backed maps
+    KIND_KEYS = tuple(map(ITEM_KEYS.get, range(PLAYER + 1)))
+    TYPE_KEYS = {Coin1: 'coin1', Coin2: 'coin2', Coin3: 'coin3', Wall: 'walls'}
+    # Cell kind as in arrayMap by item type, anything else is a player
+    CELL_KINDS = {type(None): EMPTY, **ArrayMap.KINDS}
+    # Vision windows of more cells than this are read per player on an ArrayMap when they rarely overlap
+    PER_PLAYER_AREA = 256
+
+    def __init__(self, playerNames: dict[str,list[str]], width: int = 10, height: int = 10, mapType: type[Map] = Map):
         """
         :param playerNames: Dictionary for each team name with a list of player names
+        :param mapType: Map backend to store the board in, e.g. Map or ArrayMap
         """
         self.numTeams = len(playerNames)
 
@@ -20,7 +37,15 @@ class Game:
 
         self.__height = height
         self.__width = width
-        self.map = Map(height, width, list(self.all_players.values()))
+        self.map = mapType(height, width, list(self.all_players.values()))
+
+        self.__playerIndex = PlayerIndex()
+        for player in self.all_players.values():
+            self.__playerIndex.add(player)
+
+        # Lobby-wide payloads, each stamped with the version it was built at
+        self.__version = 0
+        self.__payloadCache: dict[Hashable, tuple[int, object]] = {}
 
     def __initializePlayers(self, playerNames: dict[str,list[str]]):
         teams = {}
@@ -48,12 +73,109 @@ class Game:
             return
 
         if isinstance(cell, Coin):
-            player.team.increaseScore(cell.value)
-            self.map.decreaseCoin()
+            self.__collectCoin(player, cell)
 
         self.map.set(player.loc, None)
         self.map.set(new_loc, player)
         player.loc = new_loc
+        self.__playerIndex.move(player, (x, y))
+
+    def applyMoves(self, moves: Iterable[tuple[str, Moveset]], sequential: bool = False):
+        """
+        Resolves every move of a turn at once.
+        With sequential=True this is the same as calling movePlayer for each move in order.
+        Otherwise all players move simultaneously, conflicts are resolved over arrays and the board, player locations
+        and player index are written in one batch each. The fixed numpy cost makes a turn about 2x slower than the
+        sequential one for 20 players, from around 200 players it is faster (1.3-1.5x at 200, 2-3x at 1000, see the
+        applyMoves benchmark group). The rules:
+            - a move off the map or into a wall is blocked
+            - when several players target the same cell, the first one in moves claims it and the others are blocked
+            - a player may step into a cell another player leaves this turn, but two players swapping cells are both blocked
+            - a move into a player who stays where they are is blocked, which can in turn block the players behind them
+            - coins are collected by the player who ends up on their cell
+        :param moves: (playerName, move) pairs, at most one per player
+        """
+        moves = list(moves)
+        if sequential:
+            for playerName, move in moves:
+                self.movePlayer(playerName, move)
+            return
+        if not moves:
+            return
+
+        try:
+            players = [self.all_players[playerName] for playerName, _ in moves]
+        except KeyError as e:
+            raise KeyError(f'{e.args[0]} is not a valid player name') from None
+        if len(set(map(id, players))) != len(players):
+            raise ValueError('A player can only move once per turn')
+        try:
+            # _value_ is the member's value without the enum descriptor, which costs more than the rest per move
+            deltas = [move._value_ for _, move in moves]
+        except AttributeError:
+            raise TypeError('moves must be Moveset members') from None
+
+        n = len(players)
+        locs = np.fromiter(chain.from_iterable([player.loc for player in players]), dtype=np.int64, count=2*n).reshape(n, 2)
+        targets = locs + np.fromiter(chain.from_iterable(deltas), dtype=np.int64, count=2*n).reshape(n, 2)
+        onMap = (targets[:, 0] >= 0) & (targets[:, 0] < self.__height) & (targets[:, 1] >= 0) & (targets[:, 1] < self.__width)
+        clipped = np.where(onMap[:, None], targets, locs)
+        kinds = self.__kindsAt(clipped[:, 0], clipped[:, 1])
+        blocked = ~onMap | (kinds == WALL)
+
+        # First claim on each target cell wins
+        flatLocs = locs[:, 0] * self.__width + locs[:, 1]
+        flatTargets = clipped[:, 0] * self.__width + clipped[:, 1]
+        candidates = np.flatnonzero(~blocked)
+        _, firstClaims = np.unique(flatTargets[candidates], return_index=True)
+        claimed = np.zeros(len(players), dtype=bool)
+        claimed[candidates[firstClaims]] = True
+        blocked |= ~claimed
+
+        # Index of the moving player currently standing on each target, -1 if none
+        order = np.argsort(flatLocs)
+        pos = np.minimum(np.searchsorted(flatLocs[order], flatTargets), len(players) - 1)
+        occupant = np.where(flatLocs[order][pos] == flatTargets, order[pos], -1)
+        hasOccupant = occupant >= 0
+
+        blocked |= (kinds == PLAYER) & ~hasOccupant
+        blocked |= hasOccupant & (flatTargets[occupant] == flatLocs) & (occupant != np.arange(len(players)))
+
+        # Blocked players stay put, so whoever walks into them is blocked too
+        while True:
+            newlyBlocked = ~blocked & hasOccupant & blocked[occupant]
+            if not newlyBlocked.any():
+                break
+            blocked |= newlyBlocked
+
+        # Coins are taken off the board first, every target is then empty or left by its player
+        for i in np.flatnonzero(~blocked & (kinds >= COIN1) & (kinds <= COIN3)).tolist():
+            coinLoc = tuple(clipped[i].tolist())
+            self.__collectCoin(players[i], self.map.get(coinLoc))
+            self.map.set(coinLoc, None)
+
+        movers = np.flatnonzero(~blocked)
+        movingPlayers = [players[i] for i in movers.tolist()]
+        oldLocs = [player.loc for player in movingPlayers]
+        newLocs = list(map(tuple, clipped[movers].tolist()))
+        self.map.movePlayers(oldLocs, newLocs)
+        Player.moveAll(movingPlayers, newLocs)
+        self.__playerIndex.moveMany(movingPlayers, oldLocs, newLocs)
+
+    def __collectCoin(self, player: Player, coin: Coin):
+        player.team.increaseScore(coin.value)
+        self.map.decreaseCoin()
+        self.__version += 1
+
+    def __kindsAt(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        :return: cell kinds as in arrayMap at the given coordinates
+        """
+        if isinstance(self.map, ArrayMap):
+            return self.map.kinds[xs, ys]
+        getCell = self.map._getCell
+        return np.array([Game.CELL_KINDS.get(type(cell), PLAYER) for cell in map(getCell, xs.tolist(), ys.tolist())],
+                        dtype=np.int8)
 
     def getPlayer(self, playerName: str) -> Player:
         assert isinstance(playerName, str)
@@ -62,6 +184,12 @@ class Game:
         except KeyError:
             raise KeyError(f'{playerName} is not a valid player name')
 
+    def playersNear(self, loc: tuple[int, int], radius: int) -> list[Player]:
+        """
+        :return: players at most radius rows and columns away from loc, in row-major order
+        """
+        return self.__playerIndex.near(loc, radius)
+
     def getGameData(self, playerName:str, visionRadius: int = 2) -> dict:
         """
         :param playerName:
@@ -80,27 +208,153 @@ class Game:
         assert isinstance(playerName, str)
         assert isinstance(visionRadius, int)
         player = self.getPlayer(playerName)
-        centerX, centerY = player.loc
-        minX = max(centerX - visionRadius, 0)
-        maxX = min(centerX + visionRadius, self.__height-1)
-        minY = max(centerY - visionRadius, 0)
-        maxY = min(centerY + visionRadius, self.__width-1)
-        gameData = {'teammateNames': [],
-                    'teammatePositions': [],
-                    'enemyPositions': [],
-                    'currentPosition': player.loc,
-                    'coin1': [],
-                    'coin2': [],
-                    'coin3': [],
-                    'walls': []}
+        minX, maxX, minY, maxY = self.__visionWindow(player.loc, visionRadius)
+        gameData = self.__newGameData(player)
+
+        if isinstance(self.map, ArrayMap):
+            xs, ys, cellKinds = self.__nonEmptyCells([(minX, maxX, minY, maxY)])
+            self.__addCellData(gameData, xs, ys, cellKinds)
+            self.__addPlayerData(gameData, player, visionRadius)
+            return gameData
 
         for x in range(minX, maxX+1):
             for y in range(minY, maxY+1):
                 cell = self.map.get((x,y))
-                self.__addGameData(gameData, cell, (x,y), player)
+                if not isinstance(cell, Player):
+                    self.__addGameData(gameData, cell, (x,y), player)
+        self.__addPlayerData(gameData, player, visionRadius)
 
         return gameData
 
+    def getAllGameData(self, visionRadius: int = 2) -> dict[str, dict]:
+        """
+        Computes every player's view from a single scan over the union of their vision windows,
+        except for the ArrayMap lobbies in which per-player windows are cheaper, see PER_PLAYER_AREA
+        :param visionRadius:
+        :return: {playerName: getGameData(playerName, visionRadius), ...}
+        """
+        assert isinstance(visionRadius, int)
+        players = list(self.all_players.values())
+        if not players:
+            return {}
+
+        if isinstance(self.map, ArrayMap):
+            # getGameData cuts an ArrayMap window out in C, which beats the shared scan when windows are large and
+            # barely overlap, i.e. for few players with a wide vision
+            area = (2*visionRadius + 1) ** 2
+            if area > Game.PER_PLAYER_AREA and len(players) * area < 2 * self.__height * self.__width:
+                return {player.name: self.getGameData(player.name, visionRadius) for player in players}
+
+        windows = [self.__visionWindow(player.loc, visionRadius) for player in players]
+        flat, items = self.__itemsIn(windows)
+
+        # Each window row is a run of consecutive flat indices, cut out of the row-major item list with two bisects
+        width = self.__width
+        allGameData = {}
+        for player, (minX, maxX, minY, maxY) in zip(players, windows):
+            gameData = self.__newGameData(player)
+            start = 0
+            for rowStart in range(minX*width, maxX*width+1, width):
+                start = bisect_left(flat, rowStart + minY, start)
+                end = bisect_right(flat, rowStart + maxY, start)
+                for key, loc in items[start:end]:
+                    gameData[key].append(loc)
+                start = end
+            self.__addPlayerData(gameData, player, visionRadius)
+            allGameData[player.name] = gameData
+
+        return allGameData
+
+    def __visionWindow(self, center: tuple[int, int], visionRadius: int) -> tuple[int, int, int, int]:
+        """
+        :return: inclusive (minX, maxX, minY, maxY) bounds of the window clipped to the map
+        """
+        centerX, centerY = center
+        minX = max(centerX - visionRadius, 0)
+        maxX = min(centerX + visionRadius, self.__height-1)
+        minY = max(centerY - visionRadius, 0)
+        maxY = min(centerY + visionRadius, self.__width-1)
+        return minX, maxX, minY, maxY
+
+    @staticmethod
+    def __newGameData(player: Player) -> dict:
+        return {'teammateNames': [],
+                'teammatePositions': [],
+                'enemyPositions': [],
+                'currentPosition': player.loc,
+                'coin1': [],
+                'coin2': [],
+                'coin3': [],
+                'walls': []}
+
+    def __nonEmptyCells(self, windows: list[tuple[int, int, int, int]]):
+        """
+        Scans the union of the given windows of an ArrayMap once for occupied cells, so overlapping windows are only read once
+        :param windows: inclusive (minX, maxX, minY, maxY) bounds as returned by __visionWindow
+        :return: (xs, ys, kinds) arrays in row-major order, kinds as in arrayMap
+        """
+        minX, minY = min(w[0] for w in windows), min(w[2] for w in windows)
+        maxX, maxY = max(w[1] for w in windows), max(w[3] for w in windows)
+        kinds = self.map.kinds[minX:maxX+1, minY:maxY+1]
+        if len(windows) == 1:
+            xs, ys = np.nonzero(kinds)
+        else:
+            covered = np.zeros(kinds.shape, dtype=bool)
+            for wMinX, wMaxX, wMinY, wMaxY in windows:
+                covered[wMinX-minX:wMaxX-minX+1, wMinY-minY:wMaxY-minY+1] = True
+            xs, ys = np.nonzero((kinds != 0) & covered)
+        return xs + minX, ys + minY, kinds[xs, ys]
+
+    def __itemsIn(self, windows: list[tuple[int, int, int, int]]) -> tuple[list[int], list[tuple[str, tuple[int, int]]]]:
+        """
+        Collects the items (coins and walls) in the union of the given windows, reading each cell once
+        :return: (flat, items) in row-major order, flat holding x*width+y of each (gameData key, (x, y)) in items
+        """
+        if isinstance(self.map, ArrayMap):
+            xs, ys, cellKinds = self.__nonEmptyCells(windows)
+            isItem = cellKinds != PLAYER
+            xs, ys, cellKinds = xs[isItem], ys[isItem], cellKinds[isItem]
+            keys = Game.KIND_KEYS
+            items = list(zip([keys[kind] for kind in cellKinds.tolist()], zip(xs.tolist(), ys.tolist())))
+            return (xs * self.__width + ys).tolist(), items
+
+        # Merge the column ranges covering each row, then read each covered cell once
+        rows: dict[int, list[tuple[int, int]]] = {}
+        for wMinX, wMaxX, wMinY, wMaxY in windows:
+            for x in range(wMinX, wMaxX+1):
+                rows.setdefault(x, []).append((wMinY, wMaxY))
+
+        grid = self.map.map
+        keys = Game.TYPE_KEYS
+        flat, items = [], []
+        for x in sorted(rows):
+            cells = grid[x]
+            nextY = 0
+            for wMinY, wMaxY in sorted(rows[x]):
+                for y in range(max(wMinY, nextY), wMaxY+1):
+                    key = keys.get(type(cells[y]))
+                    if key is not None:
+                        flat.append(x*self.__width + y)
+                        items.append((key, (x, y)))
+                nextY = max(nextY, wMaxY+1)
+        return flat, items
+
+    def __addCellData(self, gameData: dict, xs: np.ndarray, ys: np.ndarray, cellKinds: np.ndarray):
+        """
+        Batched version of __addGameData for items: builds every position list with masked index operations.
+        Player cells are skipped, see __addPlayerData
+        """
+        for kind, key in Game.ITEM_KEYS.items():
+            mask = cellKinds == kind
+            gameData[key] = list(zip(xs[mask].tolist(), ys[mask].tolist()))
+
+    def __addPlayerData(self, gameData: dict, player: Player, visionRadius: int):
+        """
+        Adds teammates and enemies in view from the player index rather than by scanning cells
+        """
+        for other in self.__playerIndex.near(player.loc, visionRadius):
+            self.__addGameData(gameData, other, other.loc, player)
+
     def __addGameData(self, gameData: dict, cell: object, loc: tuple[int, int], player: Player):
         if isinstance(cell, Player):
             if cell.team is player.team and cell is not player:
@@ -120,7 +374,29 @@ class Game:
     def gameOver(self):
         return self.map.numCoins <= 0
 
+    @property
+    def version(self) -> int:
+        """
+        Changes whenever a score or the number of coins left changes
+        """
+        return self.__version
+
+    def cachedPayload(self, key: Hashable, build: Callable[['Game'], object]):
+        """
+        :param key: identifies the payload, e.g. ('scores', 'json')
+        :param build: builds the payload from the game, only called when the version changed since the last build
+        :return: the payload built at the current version
+        """
+        entry = self.__payloadCache.get(key)
+        if entry is None or entry[0] != self.__version:
+            entry = (self.__version, build(self))
+            self.__payloadCache[key] = entry
+        return entry[1]
+
     def getScores(self):
+        return dict(self.cachedPayload('scores', Game.__buildScores))
+
+    def __buildScores(self) -> dict[str, int]:
         scores = {}
         for teamName, team in self.teams.items():
             scores[teamName] = team.score
@@ -4,25 +4,47 @@ Author: Charles Lee
 
 from abc import abstractmethod
 
-class Wall:
-    pass
 
-class Coin:
+class Flyweight:
+    """
+    Items without state are shared: calling the class always returns the same instance
+    """
+    __slots__ = ()
+    __instances: dict[type, object] = {}
+
+    def __new__(cls):
+        instance = Flyweight.__instances.get(cls)
+        if instance is None:
+            instance = Flyweight.__instances[cls] = super().__new__(cls)
+        return instance
+
+class Wall(Flyweight):
+    __slots__ = ()
+
+class Coin(Flyweight):
+    __slots__ = ()
+
     @abstractmethod
     def value(self):
         ...
 
 class Coin1(Coin):
+    __slots__ = ()
+
     @property
     def value(self):
         return 1
 
 class Coin2(Coin):
+    __slots__ = ()
+
     @property
     def value(self):
         return 2
 
 class Coin3(Coin):
+    __slots__ = ()
+
     @property
     def value(self):
-        return 3
\ No newline at end of file
+        return 3
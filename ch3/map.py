@@ -2,11 +2,11 @@
 Author: Charles Lee
 """
 
-from copy import deepcopy
+from array import array
 from player import Player
 import random
 from gameItems import *
-from typing import Optional
+from typing import Callable, Optional
 
 def getDefaultWallChoices():
     wall = []
@@ -20,18 +20,79 @@ def getDefaultWallChoices():
     return wall
 
 
+class MapView:
+    """
+    Read-only view of a map grid: view[x][y] or view.get((x, y)) reads a cell.
+    Cells are handed out by reference, nothing is copied when the view is created.
+    """
+    def __init__(self, height: int, width: int, getRow: Callable[[int], tuple], getCell: Callable[[int, int], object]):
+        self.__height = height
+        self.__width = width
+        self.__getRow = getRow
+        self.__getCell = getCell
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def width(self):
+        return self.__width
+
+    def __len__(self):
+        return self.__height
+
+    def __getitem__(self, x: int) -> tuple:
+        if not 0 <= x < self.__height:
+            raise IndexError(f'row {x} is outside the map')
+        return self.__getRow(x)
+
+    def __iter__(self):
+        for x in range(self.__height):
+            yield self.__getRow(x)
+
+    def get(self, loc: tuple[int, int]):
+        return self.__getCell(loc[0], loc[1])
+
+    def tolist(self) -> list[list[object]]:
+        """
+        :return: shallow list-of-lists copy of the grid, e.g. for callers that want to mutate it
+        """
+        return [list(row) for row in self]
+
+
 class Map:
     COIN_MIN_RATIO = 0.1
     COIN_MAX_RATIO = 0.2
     WALL_MIN_RATIO = 0.1
     WALL_MAX_RATIO = 0.3
 
+    # Side of the square tiles the coin index buckets coins into
+    COIN_TILE = 16
+    # Coin types by the tag stored in the low bits of coin index entries
+    COIN_TYPES = (None, Coin1, Coin2, Coin3)
+    COIN_TAGS = {Coin1: 1, Coin2: 2, Coin3: 3}
+
     def __init__(self, height: int, width: int, playersList: list[Player], wallChoices: list[tuple[int]] = None):
         assert isinstance(width, int) and isinstance(height, int)
         assert isinstance(playersList, list)
         self.__height = height
         self.__width = width
-        self.__map: list[list[object]] = [[None for _ in range(width)] for _ in range(height)]
+        self._allocate(height, width)
+
+        # Free-cell index, only kept while __fillMap places items: __free holds the flat index x*width+y of
+        # every empty cell in arbitrary order, __freePos[cell] is that cell's position in __free, so cells can
+        # be swap-removed in O(1). Afterwards only the number of empty cells is kept
+        self.__free: Optional[array] = array('i', range(height*width))
+        self.__freePos: Optional[array] = array('i', range(height*width))
+        self.__numEmpty = height*width
+
+        # Coin index: the coins of each COIN_TILE x COIN_TILE tile as (x*width+y) << 2 | tag entries, the tag
+        # being the coin's index in COIN_TYPES. Tiles without coins are None
+        self.__tilesY = -(-width // Map.COIN_TILE)
+        self.__coinTiles: list[Optional[array]] = [None] * (-(-height // Map.COIN_TILE) * self.__tilesY)
+        self.__coinCounts = dict.fromkeys(Map.COIN_TAGS, 0)
+        self.__coinValue = 0
 
         self.__numCoins = 0
 
@@ -48,8 +109,134 @@ class Map:
         self.__numCoins -= 1
 
     @property
-    def map(self):
-        return deepcopy(self.__map)
+    def numEmpty(self):
+        return self.__numEmpty
+
+    @property
+    def remainingValue(self) -> int:
+        """
+        :return: total value of the coins left on the board
+        """
+        return self.__coinValue
+
+    def coinCounts(self) -> dict[str, int]:
+        """
+        :return: {coinTypeName: number of coins of that type left on the board}
+        """
+        return {coinType.__name__: count for coinType, count in self.__coinCounts.items()}
+
+    def coinPositions(self, coinType: type[Coin] = None) -> list[tuple[int, int]]:
+        """
+        :param coinType: Coin1, Coin2 or Coin3, or None for every coin
+        :return: coin positions in row-major order
+        """
+        tilesY = self.__tilesY
+        positions = []
+        for tileX in range(len(self.__coinTiles) // tilesY):
+            # Sorting the entries of a row of tiles sorts them by position
+            entries = []
+            for tile in self.__coinTiles[tileX*tilesY:(tileX+1)*tilesY]:
+                if tile is not None:
+                    entries.extend(tile)
+            entries.sort()
+            positions.extend(self.__decode(entries, coinType))
+        return positions
+
+    def nearestCoin(self, loc: tuple[int, int], coinType: type[Coin] = None) -> Optional[tuple[int, int]]:
+        """
+        Searches the coin index in rings of tiles around loc, stopping once no unvisited tile can hold a closer coin
+        :param loc: location to measure from
+        :param coinType: Coin1, Coin2 or Coin3, or None for any coin
+        :return: position of the coin closest to loc in moves (Manhattan distance), ties broken by position,
+                 or None if there are no such coins
+        """
+        if self.__numCoinsOf(coinType) == 0:
+            return None
+        x, y = loc
+        tile, tilesY = Map.COIN_TILE, self.__tilesY
+        tilesX = len(self.__coinTiles) // tilesY
+        tileX, tileY = x // tile, y // tile
+        best = None
+        for ring in range(max(tileX, tilesX - 1 - tileX, tileY, tilesY - 1 - tileY) + 1):
+            if best is not None and best[0] <= (ring - 1) * tile:
+                # Coins in this ring or further out are at least (ring-1)*tile+1 moves away
+                break
+            for tx, ty in self.__ring(tileX, tileY, ring, tilesX, tilesY):
+                entries = self.__coinTiles[tx*tilesY + ty]
+                if entries is None:
+                    continue
+                for cx, cy in self.__decode(entries, coinType):
+                    candidate = (abs(cx - x) + abs(cy - y), (cx, cy))
+                    if best is None or candidate < best:
+                        best = candidate
+        return None if best is None else best[1]
+
+    def coinsInRect(self, minX: int, maxX: int, minY: int, maxY: int, coinType: type[Coin] = None) -> list[tuple[int, int]]:
+        """
+        :param minX, maxX, minY, maxY: inclusive bounds of the rectangle
+        :param coinType: Coin1, Coin2 or Coin3, or None for every coin
+        :return: positions of the coins inside the rectangle in row-major order
+        """
+        minX, maxX = max(minX, 0), min(maxX, self.__height - 1)
+        minY, maxY = max(minY, 0), min(maxY, self.__width - 1)
+        if minX > maxX or minY > maxY:
+            return []
+        tile, tilesY = Map.COIN_TILE, self.__tilesY
+        entries = []
+        for tx in range(minX // tile, maxX // tile + 1):
+            for ty in range(minY // tile, maxY // tile + 1):
+                tileEntries = self.__coinTiles[tx*tilesY + ty]
+                if tileEntries is not None:
+                    entries.extend(tileEntries)
+        entries.sort()
+        return [(x, y) for x, y in self.__decode(entries, coinType) if minX <= x <= maxX and minY <= y <= maxY]
+
+    def __numCoinsOf(self, coinType: type[Coin] = None) -> int:
+        return sum(self.__coinCounts.values()) if coinType is None else self.__coinCounts[coinType]
+
+    def __decode(self, entries, coinType: type[Coin] = None):
+        """
+        :return: (x, y) of the coin index entries of coinType, or of every entry when coinType is None
+        """
+        width = self.__width
+        if coinType is None:
+            return [divmod(entry >> 2, width) for entry in entries]
+        tag = Map.COIN_TAGS[coinType]
+        return [divmod(entry >> 2, width) for entry in entries if entry & 3 == tag]
+
+    @staticmethod
+    def __ring(tileX: int, tileY: int, ring: int, tilesX: int, tilesY: int):
+        """
+        :return: tiles on the square ring at Chebyshev distance ring from (tileX, tileY), clipped to the board
+        """
+        if ring == 0:
+            return [(tileX, tileY)]
+        minY, maxY = max(tileY - ring, 0), min(tileY + ring, tilesY - 1)
+        tiles = []
+        for tx in (tileX - ring, tileX + ring):
+            if 0 <= tx < tilesX:
+                tiles.extend((tx, ty) for ty in range(minY, maxY + 1))
+        for ty in (tileY - ring, tileY + ring):
+            if 0 <= ty < tilesY:
+                tiles.extend((tx, ty) for tx in range(max(tileX - ring + 1, 0), min(tileX + ring - 1, tilesX - 1) + 1))
+        return tiles
+
+    @property
+    def map(self) -> MapView:
+        """
+        :return: zero-copy read-only view of the live grid
+        """
+        return MapView(self.__height, self.__width, lambda x: tuple(self.__map[x]), self._getCell)
+
+    def snapshot(self) -> MapView:
+        """
+        Copy-on-write snapshot of the grid: rows are shared with the map until the map next writes to them.
+        Items are shared by reference, so players reflect their current state rather than the snapshot's.
+        :return: read-only view that is isolated from later changes to the map
+        """
+        rows = tuple(self.__map)
+        self.__sharedRows = set(range(self.__height))
+        return MapView(self.__height, self.__width, lambda x: tuple(rows[x]), lambda x, y: rows[x][y])
 
     @property
     def height(self):
@@ -79,11 +266,89 @@ class Map:
 
     def set(self, loc: tuple[int, int], item: object):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        self.__map[loc[0]][loc[1]] = item
+        self.__put(loc[0], loc[1], item)
 
     def get(self, loc: tuple[int, int]):
         assert isinstance(loc, tuple) and len(loc) == 2 and isinstance(loc[0], int) and isinstance(loc[1], int)
-        return self.__map[loc[0]][loc[1]]
+        return self._getCell(loc[0], loc[1])
+
+    def movePlayers(self, oldLocs: list[tuple[int, int]], newLocs: list[tuple[int, int]]):
+        """
+        Moves the players on oldLocs to newLocs in one batch, e.g. a turn of simultaneous moves.
+        Every new location must be empty or one of oldLocs, so no count or index besides the cells changes
+        """
+        if oldLocs:
+            self._moveCells(oldLocs, newLocs)
+
+    # Storage hooks, overridden by alternative backends such as ArrayMap
+    def _allocate(self, height: int, width: int):
+        self.__map: list[list[object]] = [[None for _ in range(width)] for _ in range(height)]
+        self.__sharedRows: set[int] = set()
+
+    def _getCell(self, x: int, y: int):
+        return self.__map[x][y]
+
+    def _setCell(self, x: int, y: int, item: object):
+        if x in self.__sharedRows:
+            # Row is still referenced by a snapshot, copy it before writing
+            self.__map[x] = list(self.__map[x])
+            self.__sharedRows.discard(x)
+        self.__map[x][y] = item
+
+    def _moveCells(self, oldLocs: list[tuple[int, int]], newLocs: list[tuple[int, int]]):
+        rows = self.__map
+        if self.__sharedRows:
+            for x in {x for x, _ in oldLocs} | {x for x, _ in newLocs}:
+                if x in self.__sharedRows:
+                    rows[x] = list(rows[x])
+                    self.__sharedRows.discard(x)
+        items = [rows[x][y] for x, y in oldLocs]
+        for x, y in oldLocs:
+            rows[x][y] = None
+        for (x, y), item in zip(newLocs, items):
+            rows[x][y] = item
+
+    def __put(self, x: int, y: int, item: object):
+        old = self._getCell(x, y)
+        if old is None and item is not None:
+            self.__numEmpty -= 1
+            if self.__free is not None:
+                self.__takeFree(x*self.__width + y)
+        elif old is not None and item is None:
+            self.__numEmpty += 1
+            if self.__free is not None:
+                self.__addFree(x*self.__width + y)
+
+        if isinstance(old, Coin):
+            tile = self.__coinTile(x, y)
+            self.__coinTiles[tile].remove((x*self.__width + y) << 2 | Map.COIN_TAGS[type(old)])
+            if not self.__coinTiles[tile]:
+                self.__coinTiles[tile] = None
+            self.__coinCounts[type(old)] -= 1
+            self.__coinValue -= old.value
+        if isinstance(item, Coin):
+            tile = self.__coinTile(x, y)
+            if self.__coinTiles[tile] is None:
+                self.__coinTiles[tile] = array('i')
+            self.__coinTiles[tile].append((x*self.__width + y) << 2 | Map.COIN_TAGS[type(item)])
+            self.__coinCounts[type(item)] += 1
+            self.__coinValue += item.value
+
+        self._setCell(x, y, item)
+
+    def __coinTile(self, x: int, y: int) -> int:
+        return x // Map.COIN_TILE * self.__tilesY + y // Map.COIN_TILE
+
+    def __takeFree(self, cell: int):
+        pos = self.__freePos[cell]
+        last = self.__free.pop()
+        if last != cell:
+            self.__free[pos] = last
+            self.__freePos[last] = pos
+
+    def __addFree(self, cell: int):
+        self.__freePos[cell] = len(self.__free)
+        self.__free.append(cell)
 
     def __fillMap(self, players: list[Player]):
         assert isinstance(players, list)
@@ -97,32 +362,47 @@ class Map:
         minWalls = 0 if maxWalls < minWalls else minWalls
 
         numWalls = random.randint(minWalls, maxWalls)
-        wallChoices = deepcopy(self.wallChoices)
+        wallChoices = list(self.wallChoices)
         for _ in range(numWalls):
-            self.__placeRandom(Wall(), wallChoices)
+            if self.__placeRandom(Wall(), wallChoices) is None:
+                break
 
         # Fill players
         for player in players:
             player.loc = self.__placeRandom(player)
 
-        numPlayers = len(players)
-        empty = empty - numWalls - numPlayers
+        empty = self.numEmpty
 
         self.__numCoins = random.randint(int(Map.COIN_MIN_RATIO * empty), int(Map.COIN_MAX_RATIO * empty))
         for _ in range(self.__numCoins):
             coin = random.choices((Coin1, Coin2, Coin3), (6,3,1))[0]()
             self.__placeRandom(coin)
 
+        # Nothing is placed at random once the map is filled, the index would cost 8 bytes a cell for good
+        self.__free = self.__freePos = None
+
     def __placeRandom(self, obj, choice: Optional[list] = None):
-        while True:
-            if choice is None:
-                x, y = random.randint(0, self.__height - 1), random.randint(0, self.__width - 1)
-            else:
-                x, y = random.choice(choice)
-                choice.remove((x,y))
-            if self.__map[x][y] is None:
-                self.__map[x][y] = obj
+        """
+        Places obj on a random empty cell in O(1) expected time
+        :param choice: candidate locations, consumed (swap-removed) as they are tried
+        :return: location obj was placed at, or None if no candidate in choice was empty
+        """
+        if choice is None:
+            if not self.__free:
+                raise ValueError('Cannot place an item on a full map')
+            x, y = divmod(self.__free[random.randrange(len(self.__free))], self.__width)
+            self.__put(x, y, obj)
+            return x, y
+
+        while choice:
+            i = random.randrange(len(choice))
+            x, y = choice[i]
+            choice[i] = choice[-1]
+            choice.pop()
+            if self._getCell(x, y) is None:
+                self.__put(x, y, obj)
                 return x, y
+        return None
 
 
 if __name__ == '__main__':
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Player:
+    __slots__ = ('__name', '__team', '__loc')
+
     def __init__(self, playerName: str, team: Team):
         assert isinstance(playerName, str)
 
@@ -32,3 +34,11 @@ class Player:
     def loc(self, value: tuple[int,int]):
         assert isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], int) and isinstance(value[1], int)
         self.__loc = value
+
+    @staticmethod
+    def moveAll(players: list[Player], locs: list[tuple[int, int]]):
+        """
+        Sets the location of each player, for locations built from board coordinates, which skip the checks of loc
+        """
+        for player, loc in zip(players, locs):
+            player.__loc = loc
@@ -0,0 +1,80 @@
+"""
+Spatial index of player positions
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from player import Player
+
+
+class PlayerIndex:
+    """
+    Buckets players into square tiles of bucketSize x bucketSize cells, so finding the players
+    around a location only visits the tiles overlapping the search window instead of every cell.
+    """
+    def __init__(self, bucketSize: int = 8):
+        assert isinstance(bucketSize, int) and bucketSize > 0
+        self.__bucketSize = bucketSize
+        self.__buckets: dict[tuple[int, int], list[Player]] = {}
+
+    def __bucket(self, loc: tuple[int, int]) -> tuple[int, int]:
+        return loc[0] // self.__bucketSize, loc[1] // self.__bucketSize
+
+    def add(self, player: Player):
+        self.__buckets.setdefault(self.__bucket(player.loc), []).append(player)
+
+    def remove(self, player: Player, loc: tuple[int, int] = None):
+        """
+        :param loc: location the player was indexed at, defaults to player.loc
+        """
+        bucket = self.__bucket(player.loc if loc is None else loc)
+        players = self.__buckets[bucket]
+        players.remove(player)
+        if not players:
+            del self.__buckets[bucket]
+
+    def move(self, player: Player, oldLoc: tuple[int, int]):
+        """
+        Re-indexes a player after player.loc changed from oldLoc
+        """
+        if self.__bucket(oldLoc) != self.__bucket(player.loc):
+            self.remove(player, oldLoc)
+            self.add(player)
+
+    def moveMany(self, players: list[Player], oldLocs: list[tuple[int, int]], newLocs: list[tuple[int, int]]):
+        """
+        Re-indexes players after their locations changed from oldLocs to newLocs, e.g. after a turn of simultaneous moves
+        """
+        size = self.__bucketSize
+        for player, (oldX, oldY), (x, y) in zip(players, oldLocs, newLocs):
+            # Most single steps stay inside their bucket
+            if oldX // size != x // size or oldY // size != y // size:
+                self.remove(player, (oldX, oldY))
+                self.add(player)
+
+    def near(self, loc: tuple[int, int], radius: int) -> list[Player]:
+        """
+        :param loc: center of the search window
+        :param radius: players at most radius rows and radius columns away are returned
+        :return: players inside the window sorted by position in row-major order
+        """
+        x, y = loc
+        minBX, minBY = self.__bucket((x - radius, y - radius))
+        maxBX, maxBY = self.__bucket((x + radius, y + radius))
+
+        # For very large windows walking the occupied buckets is cheaper than walking the window's tiles
+        if (maxBX - minBX + 1) * (maxBY - minBY + 1) > len(self.__buckets):
+            buckets = [players for (bx, by), players in self.__buckets.items()
+                       if minBX <= bx <= maxBX and minBY <= by <= maxBY]
+        else:
+            buckets = [self.__buckets.get((bx, by), ()) for bx in range(minBX, maxBX + 1) for by in range(minBY, maxBY + 1)]
+
+        found = []
+        for players in buckets:
+            for player in players:
+                px, py = player.loc
+                if abs(px - x) <= radius and abs(py - y) <= radius:
+                    found.append(player)
+        found.sort(key=lambda player: player.loc)
+        return found
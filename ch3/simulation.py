@@ -0,0 +1,140 @@
+"""
+Headless simulation runner for Game, no broker involved
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Optional
+from game import Game
+from map import Map
+from arrayMap import ArrayMap
+from moveset import Moveset
+from player import Player
+from gameItems import *
+
+# A policy picks the next move for a player: policy(game, playerName) -> Moveset
+Policy = Callable[[Game, str], Moveset]
+
+MOVES = tuple(Moveset)
+
+
+def randomPolicy(game: Game, playerName: str) -> Moveset:
+    return random.choice(MOVES)
+
+
+def greedyPolicy(game: Game, playerName: str) -> Moveset:
+    """
+    Steps towards the nearest coin, falling back to a random move when every step towards it is blocked
+    """
+    x, y = game.getPlayer(playerName).loc
+    target = game.map.nearestCoin((x, y))
+    if target is None:
+        return randomPolicy(game, playerName)
+
+    for move in MOVES:
+        dx, dy = move.value
+        newX, newY = x+dx, y+dy
+        if abs(target[0] - newX) + abs(target[1] - newY) >= abs(target[0] - x) + abs(target[1] - y):
+            continue
+        if not isinstance(game.map.get((newX, newY)), (Player, Wall)):
+            return move
+    return randomPolicy(game, playerName)
+
+
+def scriptedPolicy(script: dict[str, list[Moveset]]) -> Policy:
+    """
+    :param script: moves per player name, replayed in a loop
+    :return: policy playing the script
+    """
+    turns = {playerName: 0 for playerName in script}
+
+    def policy(game: Game, playerName: str) -> Moveset:
+        moves = script[playerName]
+        move = moves[turns[playerName] % len(moves)]
+        turns[playerName] += 1
+        return move
+    return policy
+
+
+POLICIES = {
+    'random': randomPolicy,
+    'greedy': greedyPolicy,
+}
+
+
+def simulate(numGames: int = 1000, maxTurns: int = 200, playerNames: dict[str, list[str]] = None,
+             width: int = 10, height: int = 10, policy: Policy = randomPolicy,
+             mapType: type[Map] = Map, seed: Optional[int] = None) -> dict:
+    """
+    Steps numGames games in lockstep until every game is over or maxTurns turns have been played
+    :param playerNames: teams for every game, as passed to Game
+    :return: {
+        games, gamesFinished, turns, moves,
+        setupSeconds, runSeconds, turnsPerSec, movesPerSec,
+        coinsCollected, valueCollected, coinsPerTurn
+    }
+    """
+    if seed is not None:
+        random.seed(seed)
+    if playerNames is None:
+        playerNames = {'TeamA': ['Player1', 'Player2'], 'TeamB': ['Player3', 'Player4']}
+
+    start = time.perf_counter()
+    games = [Game(playerNames, width, height, mapType=mapType) for _ in range(numGames)]
+    setupSeconds = time.perf_counter() - start
+
+    startCoins = sum(game.map.numCoins for game in games)
+    startValue = sum(game.map.remainingValue for game in games)
+    active = [game for game in games if not game.gameOver()]
+    turns = moves = 0
+
+    start = time.perf_counter()
+    for _ in range(maxTurns):
+        if not active:
+            break
+        for game in active:
+            for playerName in game.all_players:
+                game.movePlayer(playerName, policy(game, playerName))
+            moves += len(game.all_players)
+        turns += len(active)
+        active = [game for game in active if not game.gameOver()]
+    runSeconds = time.perf_counter() - start
+
+    coinsCollected = startCoins - sum(game.map.numCoins for game in games)
+    return {
+        'games': numGames,
+        'gamesFinished': numGames - len(active),
+        'turns': turns,
+        'moves': moves,
+        'setupSeconds': setupSeconds,
+        'runSeconds': runSeconds,
+        'turnsPerSec': turns / runSeconds if runSeconds else 0.0,
+        'movesPerSec': moves / runSeconds if runSeconds else 0.0,
+        'coinsCollected': coinsCollected,
+        'valueCollected': startValue - sum(game.map.remainingValue for game in games),
+        'coinsPerTurn': coinsCollected / turns if turns else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run headless games and report throughput')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--size', type=int, default=10, help='map height and width')
+    parser.add_argument('--teams', type=int, default=2)
+    parser.add_argument('--players', type=int, default=2, help='players per team')
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--map', choices=('list', 'array'), default='list')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    teams = {f'Team{t}': [f'Player{t}_{p}' for p in range(args.players)] for t in range(args.teams)}
+    stats = simulate(args.games, args.turns, teams, args.size, args.size, POLICIES[args.policy],
+                     ArrayMap if args.map == 'array' else Map, args.seed)
+
+    print(f"{stats['games']} games, {stats['gamesFinished']} finished, map generation {stats['setupSeconds']:.2f}s")
+    print(f"{stats['turns']} turns in {stats['runSeconds']:.2f}s: "
+          f"{stats['turnsPerSec']:.0f} turns/sec, {stats['movesPerSec']:.0f} moves/sec")
+    print(f"{stats['coinsCollected']} coins worth {stats['valueCollected']} collected, "
+          f"{stats['coinsPerTurn']:.3f} coins/turn")
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class Team:
+    __slots__ = ('__name', 'players', '__score')
+
     def __init__(self, teamName: str):
         assert isinstance(teamName, str)
         self.__name = teamName
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The ch3 modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RecordingClient():
+    """
+    Stands in for the paho client of the server, keeping everything the handlers publish
+    """
+    def __init__(self):
+        # Imported here so the engine tests run without the server's dependencies
+        from GameClient import init_lobby_state
+        init_lobby_state(self)
+        self.published: list[tuple] = [] # (topic, payload, qos)
+        self.subscribed: list[str] = []
+        self.connected = True
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload, qos))
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.connected = False
+
+    def take(self, suffix: str = '') -> list[tuple]:
+        """
+        :return: the messages published so far whose topic ends with suffix, forgetting every message
+        """
+        published, self.published = self.published, []
+        return [message for message in published if message[0].endswith(suffix)]
+
+
+class Message():
+    def __init__(self, topic: str, payload: bytes, qos: int = 0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def client():
+    return RecordingClient()
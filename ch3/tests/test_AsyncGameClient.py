@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from AsyncGameClient import AsyncGameServer
+from conftest import Message
+from GameClient import router
+
+
+class FakeMqttClient():
+    """
+    The parts of aiomqtt.Client the server uses, messages are fed in through inbox and None ends them
+    """
+    def __init__(self):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.subscribed: list[str] = []
+        self.published: list[tuple] = []
+
+    async def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    async def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload, qos))
+
+    @property
+    def messages(self):
+        async def messages():
+            while (message := await self.inbox.get()) is not None:
+                yield message
+        return messages()
+
+
+def join_messages(lobby: str) -> list[Message]:
+    return [Message('new_game', json.dumps({'lobby_name': lobby, 'team_name': team, 'player_name': player}).encode())
+            for player, team in (('a', 'A'), ('b', 'B'))] + [Message(f'games/{lobby}/start', b'START')]
+
+
+def test_serves_a_game_over_the_event_loop():
+    async def main():
+        server = AsyncGameServer(turn_timeout=0)
+        client = FakeMqttClient()
+        for message in join_messages('L') + [Message('games/L/a/move', b'UP'), Message('games/L/b/move', b'LEFT')]:
+            client.inbox.put_nowait(message)
+        client.inbox.put_nowait(None)
+        await server.run(client)
+        # The publish loop is cancelled with run, drain what it had not sent yet
+        while not server.outbox.empty():
+            client.published.append(server.outbox.get_nowait()[:3])
+        return server, client
+
+    server, client = asyncio.run(main())
+    assert client.subscribed == router.patterns
+    topics = [topic for topic, _, _ in client.published]
+    assert topics.count('games/L/a/game_state') == 2 and topics.count('games/L/b/game_state') == 2
+    assert topics[-1] == 'games/L/scores'
+    assert 'L' in server.game_dict and not server.move_dict['L']
+
+
+def test_turn_deadline_resolves_the_turn():
+    async def main():
+        server = AsyncGameServer(turn_timeout=0.1)
+        deadlines = asyncio.create_task(server.deadline_loop())
+        for message in join_messages('L'):
+            await server.handle(message.topic, message.payload)
+        await server.handle('games/L/a/move', b'UP')
+        waiting = dict(server.move_dict['L'])
+        await asyncio.sleep(0.3)
+        deadlines.cancel()
+        return server, waiting
+
+    server, waiting = asyncio.run(main())
+    assert list(waiting) == ['a']
+    assert not server.move_dict['L']
+    topics = []
+    while not server.outbox.empty():
+        topics.append(server.outbox.get_nowait()[0])
+    assert topics.count('games/L/scores') == 1
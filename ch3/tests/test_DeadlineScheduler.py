@@ -0,0 +1,124 @@
+import json
+import threading
+
+import GameClient
+from DeadlineScheduler import DeadlineScheduler
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_runs_due_callbacks_in_deadline_order():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    calls = []
+    for key, delay in (('c', 3), ('a', 1), ('b', 2), ('d', 10)):
+        scheduler.schedule(key, delay, lambda key=key: calls.append(key))
+    assert len(scheduler) == 4 and 'a' in scheduler and scheduler.next_delay() == 1
+
+    clock.now = 5
+    assert scheduler.run_due() == 3
+    assert calls == ['a', 'b', 'c'] and len(scheduler) == 1 and 'a' not in scheduler
+    assert scheduler.next_delay() == 5
+
+
+def test_reschedule_and_cancel_replace_the_deadline():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    calls = []
+    scheduler.schedule('a', 1, lambda: calls.append('first'))
+    scheduler.schedule('a', 5, lambda: calls.append('second'))
+    scheduler.schedule('b', 2, lambda: calls.append('b'))
+    scheduler.cancel('b')
+    scheduler.cancel('missing')
+
+    clock.now = 3
+    assert scheduler.run_due() == 0 and scheduler.next_delay() == 2
+    clock.now = 5
+    assert scheduler.run_due() == 1 and calls == ['second']
+    assert scheduler.next_delay() is None
+
+
+def test_many_reschedules_stay_correct_through_compaction():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    calls = []
+    for round in range(200):
+        for key in range(10):
+            scheduler.schedule(key, 100 + round + key, lambda key=key: calls.append(key))
+    assert len(scheduler) == 10
+    clock.now = 1000
+    assert scheduler.run_due() == 10 and calls == list(range(10))
+
+
+def test_callbacks_may_schedule_more():
+    clock = FakeClock()
+    scheduler = DeadlineScheduler(clock)
+    calls = []
+    scheduler.schedule('a', 1, lambda: (calls.append('a'), scheduler.schedule('b', 0, lambda: calls.append('b'))))
+    clock.now = 1
+    scheduler.run_due()
+    scheduler.run_due()
+    assert calls == ['a', 'b']
+
+
+def test_background_thread_wakes_up_for_earlier_deadlines():
+    scheduler = DeadlineScheduler()
+    fired = threading.Event()
+    scheduler.start()
+    try:
+        # Other threads schedule holding the lock, as the handlers do
+        with scheduler.lock:
+            scheduler.schedule('late', 60, lambda: None)
+        # Scheduled while the thread sleeps towards the late deadline
+        with scheduler.lock:
+            scheduler.schedule('soon', 0.05, fired.set)
+        assert fired.wait(5)
+    finally:
+        scheduler.stop()
+
+
+def test_run_returns_once_until_is_true():
+    scheduler = DeadlineScheduler()
+    done = []
+    scheduler.schedule('end', 0.01, lambda: done.append(True))
+    scheduler.run(until=lambda: bool(done))
+    assert done
+
+
+def join(client, lobby, players):
+    for player, team in players:
+        body = {'lobby_name': lobby, 'team_name': team, 'player_name': player}
+        GameClient.handle_message(client, 'new_game', json.dumps(body).encode())
+
+
+def test_turn_and_lobby_deadlines(client):
+    clock = FakeClock()
+    client.scheduler = DeadlineScheduler(clock)
+    client.turn_timeout = 30
+    client.lobby_timeout = 600
+    join(client, 'L', (('a', 'A'), ('b', 'B')))
+    join(client, 'Idle', (('c', 'A'),))
+    GameClient.handle_message(client, 'games/L/start', b'START')
+    GameClient.handle_message(client, 'games/L/a/move', b'UP')
+    client.take()
+
+    # b never moves, the turn is resolved with a's move at the deadline
+    clock.now = 29
+    client.scheduler.run_due()
+    assert client.move_dict['L']
+    clock.now = 30
+    client.scheduler.run_due()
+    assert not client.move_dict['L'] and len(client.take('/scores')) == 1
+
+    # The idle lobby expires, the playing one was touched by its moves
+    GameClient.handle_message(client, 'games/L/b/move', b'UP')
+    clock.now = 601
+    client.scheduler.run_due()
+    assert 'Idle' not in client.team_dict and 'L' in client.team_dict
+    assert ('games/Idle/lobby', 'Game Over: Lobby expired', 1) in client.take()
@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+
+import pytest
+
+import GameClient
+from conftest import RecordingClient
+from GameClient import Publisher, TOPIC_QOS
+
+
+class AckingClient():
+    """
+    Acks every message from inside publish, as paho may for QoS 0
+    """
+    def __init__(self):
+        self.publisher = None
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, qos))
+        self.publisher.acked(len(self.published))
+
+
+class HeldClient():
+    """
+    Acks only when told to
+    """
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload, qos))
+
+
+def test_synchronous_acks_drain_a_burst_without_nesting():
+    client = AckingClient()
+    publisher = client.publisher = Publisher(client, max_in_flight=2)
+    for i in range(5000):
+        publisher.queue(f'games/L/p{i}/game_state', i)
+    publisher.flush()
+    assert [payload for _, payload, _ in client.published] == list(range(5000))
+    assert publisher.in_flight == 0 and not publisher.pending and publisher.sent == 5000
+
+
+def test_in_flight_limit_holds_messages_until_acked():
+    client = HeldClient()
+    publisher = Publisher(client, max_in_flight=2)
+    for i in range(5):
+        publisher.queue('games/L/scores', i)
+    publisher.flush()
+    assert len(client.published) == 2 and publisher.in_flight == 2 and len(publisher.pending) == 3
+
+    publisher.acked(1)
+    assert len(client.published) == 3 and publisher.in_flight == 2
+    for mid in range(2, 6):
+        publisher.acked(mid)
+    assert [payload for _, payload, _ in client.published] == list(range(5))
+    assert publisher.in_flight == 0 and not publisher.pending
+
+
+def test_failed_publish_releases_its_slot():
+    class FailingClient(HeldClient):
+        def publish(self, topic, payload, qos=0, retain=False):
+            raise ValueError(payload)
+
+    publisher = Publisher(FailingClient(), max_in_flight=1)
+    publisher.queue('games/L/scores', 'bad')
+    publisher.queue('games/L/scores', 'next')
+    try:
+        publisher.flush()
+    except ValueError:
+        pass
+    assert publisher.in_flight == 0 and len(publisher.pending) == 1
+
+    publisher.client = HeldClient()
+    publisher.flush()
+    assert [payload for _, payload, _ in publisher.client.published] == ['next']
+
+
+def test_acks_from_another_thread_keep_the_count_consistent():
+    client = HeldClient()
+    publisher = Publisher(client, max_in_flight=4)
+    for i in range(2000):
+        publisher.queue('games/L/scores', i)
+    publisher.flush()
+
+    def ack():
+        while publisher.sent < 2000 or publisher.in_flight:
+            if publisher.in_flight:
+                publisher.acked(0)
+    acker = threading.Thread(target=ack)
+    acker.start()
+    acker.join(10)
+    assert not acker.is_alive()
+    assert [payload for _, payload, _ in client.published] == list(range(2000))
+    assert publisher.in_flight == 0
+
+
+def test_queue_defaults_qos_by_topic_class():
+    client = HeldClient()
+    publisher = Publisher(client)
+    publisher.queue('games/L/p/game_state', 'state')
+    publisher.queue('games/L/scores', 'scores')
+    publisher.queue('games/L/lobby', 'Game Over')
+    publisher.queue('games/L/scores', 'forced', qos=2)
+    publisher.flush()
+    assert [qos for _, _, qos in client.published] == \
+        [TOPIC_QOS.get('game_state', 0), TOPIC_QOS.get('scores', 0), TOPIC_QOS.get('lobby', 0), 2]
+    assert publisher.in_flight == 0
+
+
+def play_lobby(seed: int) -> RecordingClient:
+    client = RecordingClient()
+    random.seed(seed)
+    for player, team in (('a', 'A'), ('b', 'A'), ('c', 'B')):
+        body = {'lobby_name': 'L', 'team_name': team, 'player_name': player}
+        GameClient.handle_message(client, 'new_game', json.dumps(body).encode())
+    GameClient.handle_message(client, 'games/L/start', b'START')
+    for move in (b'UP', b'LEFT', b'DOWN', b'RIGHT'):
+        for player in ('a', 'b', 'c'):
+            GameClient.handle_message(client, f'games/L/{player}/move', move)
+    return client
+
+
+@pytest.mark.parametrize('name', sorted(GameClient.MAP_TYPES))
+def test_games_use_the_configured_map_type(monkeypatch, name):
+    monkeypatch.setattr(GameClient, 'MAP_TYPE', GameClient.MAP_TYPES[name])
+    client = play_lobby(3)
+    assert type(client.game_dict['L'].map) is GameClient.MAP_TYPES[name]
+
+    # Both backends play the same game
+    monkeypatch.setattr(GameClient, 'MAP_TYPE', GameClient.Map)
+    assert client.published == play_lobby(3).published
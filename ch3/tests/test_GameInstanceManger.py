@@ -0,0 +1,68 @@
+import threading
+
+import GameClient
+import GameInstanceManger
+from conftest import Message, RecordingClient, wait_for
+from GameInstanceManger import GameInstanceManager
+
+TEAMS = {'A': ['a'], 'B': ['b']}
+
+
+def start_manager(client: RecordingClient) -> GameInstanceManager:
+    manager = GameInstanceManager('L', TEAMS, client=client)
+    manager.start()
+    return manager
+
+
+def test_runs_its_lobby_until_stopped():
+    client = RecordingClient()
+    manager = start_manager(client)
+    wait_for(lambda: 'games/L/start' in client.subscribed)
+    assert sorted(client.subscribed) == ['admin/profile', 'games/L/a/move', 'games/L/b/move', 'games/L/start']
+
+    # START on the running lobby is ignored, moves resolve turns, STOP ends the game
+    manager.on_message(client, None, Message('games/L/start', b'START'))
+    manager.on_message(client, None, Message('games/L/a/move', b'UP'))
+    manager.on_message(client, None, Message('games/L/b/move', b'DOWN'))
+    manager.on_message(client, None, Message('games/L/start', b'STOP'))
+    manager.thread.join(5)
+
+    assert not manager.thread.is_alive() and manager.finished and not client.connected
+    topics = [topic for topic, _, _ in client.published]
+    assert topics.count('games/L/a/game_state') == 2 and topics.count('games/L/scores') == 1
+    assert client.published[-1][:2] == ('games/L/lobby', 'Game Over: Game has been stopped')
+
+
+def test_expired_lobby_ends_the_runner(monkeypatch):
+    monkeypatch.setattr(GameClient, 'LOBBY_TIMEOUT', 0.1)
+    client = RecordingClient()
+    manager = start_manager(client)
+    manager.thread.join(5)
+    assert not manager.thread.is_alive() and manager.finished
+    assert client.published[-1][:2] == ('games/L/lobby', 'Game Over: Lobby expired')
+
+
+def test_thread_runner_connects_off_the_main_clients_network_thread(monkeypatch):
+    connecting, release = threading.Event(), threading.Event()
+    lobby_client = RecordingClient()
+
+    def connect_client(client_id):
+        connecting.set()
+        assert threading.current_thread() is not threading.main_thread()
+        release.wait(5)
+        return lobby_client
+    monkeypatch.setattr(GameInstanceManger, 'connect_client', connect_client)
+
+    client = RecordingClient()
+    client.lobby_runner, client.runner_dict = 'thread', {}
+    client.team_dict['L'] = {**TEAMS, 'started': False}
+    # The main client's on_message returns while the lobby's client is still connecting
+    GameClient.on_message(client, None, Message('games/L/start', b'START'))
+    manager = client.runner_dict['L']
+    assert connecting.wait(5) and GameClient.lobby_handed_off(client, 'L')
+
+    release.set()
+    wait_for(lambda: 'games/L/start' in lobby_client.subscribed)
+    manager.on_message(lobby_client, None, Message('games/L/start', b'STOP'))
+    manager.thread.join(5)
+    assert manager.finished and not GameClient.lobby_handed_off(client, 'L')
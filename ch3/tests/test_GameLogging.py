@@ -0,0 +1,74 @@
+import json
+import logging
+
+import pytest
+
+from GameLogging import ROOT, JsonFormatter, SampleFilter, TextFormatter, configure_logging, get_logger, \
+    parse_sample_rates
+
+
+def make_record(msg='moved %s', args=('UP',), **extra):
+    record = logging.getLogger('server.test').makeRecord('server.test', logging.INFO, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('') == {}
+    assert parse_sample_rates('message=100, move=10,') == {'message': 100, 'move': 10}
+
+
+def test_sample_filter_keeps_the_first_and_every_nth_record():
+    sample = SampleFilter({'move': 3, 'turn': 1})
+    kept = [sample.filter(make_record(event='move')) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert all(sample.filter(make_record(event='turn')) for _ in range(3))
+    assert all(sample.filter(make_record()) for _ in range(3))
+
+
+def test_text_formatter_appends_extra_fields():
+    line = TextFormatter().format(make_record(event='move', lobby='L'))
+    assert line.endswith('INFO server.test: moved UP event=move lobby=L')
+    assert TextFormatter().format(make_record()).endswith('server.test: moved UP')
+
+
+def test_json_formatter_makes_extra_fields_keys():
+    entry = json.loads(JsonFormatter().format(make_record(event='move', lobby='L', cells={1, 2})))
+    assert entry['level'] == 'INFO' and entry['logger'] == 'server.test' and entry['msg'] == 'moved UP'
+    assert entry['event'] == 'move' and entry['lobby'] == 'L' and entry['cells'] == '{1, 2}'
+
+
+@pytest.fixture
+def server_root():
+    root = logging.getLogger(ROOT)
+    saved = root.handlers[:], root.level, root.propagate
+    root.handlers.clear()
+    yield root
+    root.handlers[:], root.level, root.propagate = saved
+    get_logger('GameClient.map').setLevel(logging.NOTSET)
+
+
+def test_configure_logging_once(server_root, capsys):
+    configure_logging(level='debug', fmt='json', sample='move=2', maps=False)
+    configure_logging(level='info', fmt='text')
+    assert len(server_root.handlers) == 1 and server_root.level == logging.DEBUG
+
+    logger = get_logger('GameClient')
+    for turn in range(3):
+        logger.debug('turn %d', turn, extra={'event': 'move'})
+    get_logger('GameClient.map').info('map')
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line['msg'] for line in lines] == ['turn 0', 'turn 2']
+
+
+def test_configure_logging_from_environment(server_root, capsys, monkeypatch):
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    monkeypatch.setenv('LOG_FORMAT', 'text')
+    monkeypatch.setenv('LOG_MAPS', '1')
+    configure_logging()
+    get_logger('GameClient').info('hidden')
+    get_logger('GameClient').warning('shown', extra={'lobby': 'L'})
+    get_logger('GameClient.map').debug('map')
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 2 and out[0].endswith('shown lobby=L') and out[1].endswith('map')
@@ -0,0 +1,93 @@
+import importlib.util
+import sys
+
+import pytest
+
+import GameClient
+from GameMetrics import REGISTRY, Counter, Gauge, Histogram, Metric, Registry
+
+
+def test_counters_and_gauges_render_in_the_text_format():
+    registry = Registry()
+    moves = registry.register(Counter('moves_total', 'Moves', ('lobby',)))
+    moves.labels('L').inc()
+    moves.labels('L').inc(2)
+    moves.labels('M').inc()
+    registry.register(Gauge('depth', 'Queue depth')).set(7)
+    registry.register(Gauge('lobbies', 'Lobbies', ('state',), function=lambda: {('running',): 1, ('waiting',): 2}))
+    assert registry.render().splitlines() == [
+        '# HELP moves_total Moves', '# TYPE moves_total counter',
+        'moves_total{lobby="L"} 3', 'moves_total{lobby="M"} 1',
+        '# HELP depth Queue depth', '# TYPE depth gauge', 'depth 7',
+        '# HELP lobbies Lobbies', '# TYPE lobbies gauge',
+        'lobbies{state="running"} 1', 'lobbies{state="waiting"} 2',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    seconds = registry.register(Histogram('turn_seconds', 'Turns', ('lobby',), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        seconds.labels('L').observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'turn_seconds_bucket{lobby="L",le="0.1"} 2',
+        'turn_seconds_bucket{lobby="L",le="1.0"} 3',
+        'turn_seconds_bucket{lobby="L",le="+Inf"} 4',
+        'turn_seconds_sum{lobby="L"} 2.65',
+        'turn_seconds_count{lobby="L"} 4',
+    ]
+
+
+def test_registering_a_name_again_returns_the_registered_metric():
+    registry = Registry()
+    first = registry.register(Counter('games_total', 'Games'))
+    first.inc()
+    assert registry.register(Counter('games_total', 'Games')) is first
+    assert 'games_total 1' in registry.render()
+
+    depth = registry.register(Gauge('depth', 'Depth', function=lambda: 1))
+    assert registry.register(Gauge('depth', 'Depth', function=lambda: 2)) is depth
+    assert 'depth 2' in registry.render()
+
+
+@pytest.mark.parametrize('metric', [
+    Gauge('games_total', 'Games'),
+    Counter('games_total', 'Games', ('lobby',)),
+    Counter('games_total', 'Games', function=lambda: 0),
+])
+def test_registering_a_different_metric_under_a_name_fails(metric):
+    registry = Registry()
+    registry.register(Counter('games_total', 'Games'))
+    with pytest.raises(ValueError):
+        registry.register(metric)
+
+
+def test_reimporting_GameClient_keeps_its_metrics():
+    GameClient.games_started.inc()
+    GameClient.turn_seconds.observe(0.5)
+    started = GameClient.games_started.value
+    before = REGISTRY.render()
+
+    # As when GameClient runs as __main__ and GameInstanceManager imports it again
+    spec = importlib.util.spec_from_file_location('GameClient_again', GameClient.__file__)
+    again = importlib.util.module_from_spec(spec)
+    sys.modules['GameClient_again'] = again
+    try:
+        spec.loader.exec_module(again)
+    finally:
+        del sys.modules['GameClient_again']
+
+    assert again.games_started is GameClient.games_started and again.turn_seconds is GameClient.turn_seconds
+    again.games_started.inc()
+    assert GameClient.games_started.value == started + 1
+    assert f'game_games_started_total {started}' in before
+    assert f'game_games_started_total {started + 1}' in REGISTRY.render()
+
+
+def test_metric_kinds_must_render_their_samples():
+    class Untyped(Metric):
+        pass
+    with pytest.raises(TypeError):
+        Untyped('x', 'help')
+    with pytest.raises(TypeError):
+        Metric('x', 'help')
@@ -0,0 +1,49 @@
+import json
+import zlib
+
+from conftest import wait_for
+from GameShards import GameShardPool
+
+LOBBIES = ('L1', 'L2', 'L3', 'L4')
+
+
+def join(pool: GameShardPool, lobby: str):
+    for player, team in (('a', 'A'), ('b', 'B')):
+        pool.route('new_game', json.dumps({'lobby_name': lobby, 'team_name': team, 'player_name': player}).encode())
+    pool.route(f'games/{lobby}/start', b'START')
+
+
+def test_shard_for_is_stable_and_spread():
+    pool = GameShardPool(3)
+    assert [pool.shard_for(lobby) for lobby in LOBBIES] == [zlib.crc32(lobby.encode()) % 3 for lobby in LOBBIES]
+    assert len({pool.shard_for(f'Lobby{i}') for i in range(30)}) == 3
+
+
+def test_workers_run_lobbies_and_publish_through_the_front_end(client):
+    pool = GameShardPool(2)
+    pool.start(client)
+    try:
+        # Unparseable payloads go to worker 0, which must keep running
+        pool.route('new_game', b'garbage')
+        for lobby in LOBBIES:
+            join(pool, lobby)
+        states = lambda: {topic for topic, _, _ in list(client.published) if topic.endswith('/game_state')}
+        wait_for(lambda: len(states()) == 2 * len(LOBBIES))
+
+        for lobby in LOBBIES:
+            pool.route(f'games/{lobby}/a/move', b'UP')
+            pool.route(f'games/{lobby}/b/move', b'DOWN')
+        scores = lambda: [topic for topic, _, _ in list(client.published) if topic.endswith('/scores')]
+        wait_for(lambda: len(scores()) == len(LOBBIES))
+        assert sorted(scores()) == [f'games/{lobby}/scores' for lobby in LOBBIES]
+        # QoS chosen by the workers survives the trip through the front end's publisher
+        assert all(qos == 1 for topic, _, qos in list(client.published) if topic.endswith('/scores'))
+    finally:
+        pool.stop()
+    assert not any(worker.is_alive() for worker in pool.workers)
+
+
+def test_workers_are_spawned_rather_than_forked():
+    # The front end starts its pool once connected, forked workers would share its broker socket
+    assert GameShardPool(1).context.get_start_method() == 'spawn'
+    assert GameShardPool(1, 'fork').context.get_start_method() == 'fork'
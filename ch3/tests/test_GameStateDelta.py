@@ -0,0 +1,68 @@
+import json
+import random
+
+import GameClient
+from game import Game
+from GameStateDelta import GameStateDecoder, GameStateEncoder, to_json_view
+from moveset import Moveset
+
+
+def json_view(game_data: dict) -> dict:
+    return json.loads(json.dumps(game_data))
+
+
+def test_decoder_rebuilds_every_view():
+    random.seed(1)
+    game = Game({'A': ['a1', 'a2'], 'B': ['b1']}, 12, 12)
+    encoder = GameStateEncoder(keyframe_interval=5)
+    decoders = {name: GameStateDecoder() for name in game.all_players}
+    rng = random.Random(1)
+    for turn in range(30):
+        for name in game.all_players:
+            game_data = game.getGameData(name)
+            message = json_view(encoder.encode(name, game_data))
+            assert ('keyframe' in message) == (turn % 5 == 0)
+            assert decoders[name].apply(message) == json_view(game_data) == to_json_view(game_data)
+        for name in game.all_players:
+            game.movePlayer(name, rng.choice(list(Moveset)))
+
+
+def test_unchanged_view_sends_only_the_sequence_number():
+    encoder = GameStateEncoder()
+    state = {'teammateNames': ['b'], 'teammatePositions': [(0, 1)], 'enemyPositions': [], 'currentPosition': (0, 0),
+             'coin1': [(1, 1)], 'coin2': [], 'coin3': [], 'walls': [(2, 2)]}
+    assert encoder.encode('a', state)['keyframe']
+    assert encoder.encode('a', state) == {'seq': 1}
+
+    moved = dict(state, currentPosition=(0, 1), coin1=[], walls=[(2, 2), (3, 3)])
+    assert encoder.encode('a', moved) == {'seq': 2, 'added': {'walls': [[3, 3]]}, 'removed': {'coin1': [[1, 1]]},
+                                          'changed': {'currentPosition': [0, 1]}}
+
+
+def test_decoder_waits_for_a_keyframe_after_a_missed_message():
+    encoder = GameStateEncoder(keyframe_interval=100)
+    decoder = GameStateDecoder()
+    state = {key: [] for key in ('teammateNames', 'teammatePositions', 'enemyPositions', 'coin1', 'coin2', 'coin3', 'walls')}
+    states = [dict(state, currentPosition=(0, y), coin1=[(5, y)]) for y in range(4)]
+
+    assert decoder.apply(encoder.encode('a', states[0])) is not None
+    encoder.encode('a', states[1]) # Lost
+    assert decoder.apply(encoder.encode('a', states[2])) is None
+    encoder.keyframe_next('a')
+    assert decoder.apply(json_view(encoder.encode('a', states[3]))) == json_view(states[3])
+
+
+def test_server_publishes_deltas(client, monkeypatch):
+    monkeypatch.setattr(GameClient, 'DELTA_KEYFRAME_INTERVAL', 3)
+    random.seed(2)
+    for player, team in (('a', 'A'), ('b', 'B')):
+        GameClient.handle_message(client, 'new_game', json.dumps({'lobby_name': 'L', 'team_name': team, 'player_name': player}).encode())
+    GameClient.handle_message(client, 'games/L/start', b'START')
+    game = client.game_dict['L']
+    decoders = {'a': GameStateDecoder(), 'b': GameStateDecoder()}
+    for turn in range(8):
+        for topic, payload, _ in client.take('/game_state'):
+            name = topic.split('/')[2]
+            assert decoders[name].apply(json.loads(payload)) == json_view(game.getGameData(name))
+        for name in ('a', 'b'):
+            GameClient.handle_message(client, f'games/L/{name}/move', random.choice((b'UP', b'DOWN', b'LEFT', b'RIGHT')))
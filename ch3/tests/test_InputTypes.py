@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from InputTypes import (Move, Start, MOVE_TOKENS, START_TOKENS, parse_move, parse_new_player, parse_profile_request,
+                        parse_start)
+from moveset import Moveset
+
+CANDIDATES = ('UP', 'DOWN', 'LEFT', 'RIGHT', 'START', 'STOP', 'up', 'Up', ' UP', 'UP ', '', 'NORTH', 'STARTED', 'stop')
+
+
+def outcome(parse, payload):
+    try:
+        return parse(payload)
+    except ValueError:
+        return ValueError
+
+
+@pytest.mark.parametrize('candidate', CANDIDATES)
+def test_bare_tokens_accept_exactly_what_the_models_accept(candidate):
+    # The token tables are derived from the models, a bare token and its JSON body must never disagree
+    move_body = json.dumps({'move': candidate}).encode()
+    assert outcome(parse_move, candidate.encode()) == outcome(parse_move, candidate) == outcome(parse_move, move_body)
+    start_body = json.dumps({'start': candidate}).encode()
+    assert outcome(parse_start, candidate.encode()) == outcome(parse_start, candidate) == outcome(parse_start, start_body)
+
+
+def test_tokens():
+    assert {token for token in MOVE_TOKENS if isinstance(token, str)} == set(Moveset.__members__)
+    assert all(MOVE_TOKENS[move.name.encode()] is move for move in Moveset)
+    assert set(START_TOKENS.values()) == {'START', 'STOP'}
+    assert Move(move='LEFT').move is Moveset.LEFT and Start(start='STOP').start == 'STOP'
+    assert Move(move=Moveset.UP).move is Moveset.UP
+    # Moves are accepted by name only, not by their delta
+    for bad in ('SIDEWAYS', 'left', Moveset.LEFT.value, list(Moveset.LEFT.value)):
+        with pytest.raises(ValidationError):
+            Move(move=bad)
+
+
+@pytest.mark.parametrize('payload', (b'{"move": 1}', b'{"moves": "UP"}', b'{"move": "UP"', b'[]', b'\xff', b'null'))
+def test_malformed_moves(payload):
+    with pytest.raises(ValueError):
+        parse_move(payload)
+
+
+def test_new_player():
+    body = {'lobby_name': 'L', 'team_name': 'T', 'player_name': 'P'}
+    player = parse_new_player(json.dumps(body).encode())
+    assert (player.lobby_name, player.team_name, player.player_name, player.wire_format) == ('L', 'T', 'P', 'json')
+    assert parse_new_player(json.dumps(dict(body, wire_format='binary'))).wire_format == 'binary'
+
+    for bad in (dict(body, lobby_name=''), dict(body, player_name='x' * 21), dict(body, wire_format='xml'),
+                {'lobby_name': 'L', 'team_name': 'T'}):
+        with pytest.raises(ValueError):
+            parse_new_player(json.dumps(bad).encode())
+    with pytest.raises(ValueError):
+        parse_new_player(b'garbage')
+
+
+def test_profile_request():
+    request = parse_profile_request(b'{"lobby_name": "L"}')
+    assert (request.turns, request.every, request.cprofile, request.stop) == (10, 1, False, False)
+    for bad in (b'{"lobby_name": "L", "turns": 0}', b'{"lobby_name": "L", "every": 0}', b'{"turns": 5}'):
+        with pytest.raises(ValueError):
+            parse_profile_request(bad)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import math
+
+from conftest import Message
+from LoadGenerator import MOVES, BotLobby, LoadGenerator, merge_stats, percentile, summarize
+
+
+class FakeServer():
+    """
+    The parts of aiomqtt.Client the load generator uses, answering like the game server would: a game_state
+    for every bot once the lobby starts and once all its bots moved, and game over after the last turn
+    """
+    def __init__(self, turns: int):
+        self.turns = turns
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.published: list[tuple] = []
+        self.subscribed: list[str] = []
+        self.players: dict[str, list] = {}
+        self.moves: dict[str, int] = {}
+
+    async def subscribe(self, topic):
+        self.subscribed.append(topic)
+
+    async def unsubscribe(self, topic):
+        self.subscribed.remove(topic)
+
+    async def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+        if topic == 'new_game':
+            body = json.loads(payload)
+            self.players.setdefault(body['lobby_name'], []).append(body['player_name'])
+            return
+        lobby = topic.split('/')[1]
+        if payload == b'START':
+            self.moves[lobby] = 0
+            self.send_states(lobby)
+        elif topic.endswith('/move'):
+            self.moves[lobby] += 1
+            if self.moves[lobby] % len(self.players[lobby]) == 0:
+                if self.moves[lobby] // len(self.players[lobby]) == self.turns:
+                    self.inbox.put_nowait(Message(f'games/{lobby}/lobby', b'Game Over: All coins have been collected'))
+                else:
+                    self.send_states(lobby)
+
+    def send_states(self, lobby):
+        for player in self.players[lobby]:
+            self.inbox.put_nowait(Message(f'games/{lobby}/{player}/game_state', b'{}'))
+
+    @property
+    def messages(self):
+        async def messages():
+            while True:
+                yield await self.inbox.get()
+        return messages()
+
+
+def test_percentile_is_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 0.5) == 3 and percentile(values, 0.9) == 5 and percentile(values, 1.0) == 5
+    assert percentile(values, 0.0) == 1
+    assert math.isnan(percentile([], 0.5))
+
+
+def test_merge_stats_adds_counts_and_keeps_the_longest_run():
+    merged = merge_stats([
+        {'sent': 2, 'turn_latencies': [0.1], 'elapsed': 3.0},
+        {'sent': 5, 'turn_latencies': [0.2, 0.3], 'elapsed': 2.0},
+    ])
+    assert merged == {'sent': 7, 'turn_latencies': [0.1, 0.2, 0.3], 'elapsed': 3.0}
+
+
+def test_summarize_rates_and_latencies():
+    stats = LoadGenerator(0, 2).stats | {'sent': 20, 'received': 10, 'turn_latencies': [0.01, 0.02],
+                                         'start_latencies': [0.5], 'elapsed': 2.0}
+    summary = summarize(stats)
+    assert summary['sent_per_s'] == 10 and summary['received_per_s'] == 5
+    assert summary['turns'] == 2 and summary['turns_per_s'] == 1
+    assert math.isclose(summary['turn_latency_p50_ms'], 10) and math.isclose(summary['turn_latency_max_ms'], 20)
+    assert math.isclose(summary['start_latency_p99_ms'], 500)
+
+
+def test_bot_lobby_names_change_with_the_generation():
+    lobby = BotLobby(3, 'ld-', 4, 2)
+    assert lobby.name == 'ld-3.0' and lobby.players == ['b3_0', 'b3_1', 'b3_2', 'b3_3']
+    assert [lobby.teams[player] for player in lobby.players] == ['t0', 't1', 't0', 't1']
+    lobby.generation += 1
+    assert lobby.name == 'ld-3.1'
+
+
+def test_plays_lobbies_to_the_end():
+    server = FakeServer(turns=3)
+    generator = LoadGenerator(2, 2, rate=0, duration=10, join_wait=0)
+    stats = asyncio.run(generator.run([server]))
+
+    assert stats['games_completed'] == 2 and stats['errors'] == 0 and stats['timed_out_turns'] == 0
+    assert len(stats['start_latencies']) == 2
+    # The first turn starts the game, the two after it answer the bots' moves
+    assert len(stats['turn_latencies']) == 4
+    moves = [payload for topic, payload in server.published if topic.endswith('/move')]
+    assert len(moves) == 2 * 2 * 3 and set(moves) <= set(MOVES)
+    assert stats['sent'] == len(server.published)
+
+
+def test_restarted_lobbies_drop_moves_of_the_previous_game():
+    async def play():
+        server = FakeServer(turns=1)
+        generator = LoadGenerator(1, 2, rate=0, join_wait=0)
+        lobby = generator.lobbies[0]
+        await generator.start_lobby(lobby, server)
+        generator.on_message(f'games/{lobby.name}/b0_0/game_state', b'{}')
+        # The lobby restarts before the move scheduled for the old game is sent
+        lobby.generation += 1
+        lobby.reset()
+        await asyncio.sleep(0.01)
+        return server
+    server = asyncio.run(play())
+    assert not any(topic.endswith('/move') for topic, _ in server.published)
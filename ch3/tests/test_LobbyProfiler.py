@@ -0,0 +1,94 @@
+import json
+import os
+
+import GameClient
+from gameItems import Coin1
+from InputTypes import Moveset
+from LobbyProfiler import LobbyProfiler, collapsed_stacks, function_label
+from test_game import emptyGame
+
+R = ('/src/game.py', 10, 'resolve')
+A = ('/src/map.py', 20, 'apply')
+B = ('/src/map.py', 30, 'move')
+APPEND = ('~', 0, "<method 'append' of 'list' objects>")
+
+
+def test_function_labels():
+    assert function_label(R) == 'game.py:resolve:10'
+    assert function_label(APPEND) == "<method_'append'_of_'list'_objects>"
+
+
+def test_collapsed_stacks_split_shared_callees_by_edge_time():
+    # {func : (primitive calls, calls, self time, total time, {caller : (.., .., .., edge time)})}
+    stats = {
+        R: (1, 1, 1.0, 10.0, {}),
+        A: (1, 1, 2.0, 5.0, {R: (1, 1, 2.0, 5.0)}),
+        B: (2, 2, 4.0, 4.0, {R: (1, 1, 1.0, 1.0), A: (1, 1, 3.0, 3.0)}),
+    }
+    assert collapsed_stacks(stats) == [
+        ('game.py:resolve:10', 1.0),
+        ('game.py:resolve:10;map.py:apply:20', 2.0),
+        ('game.py:resolve:10;map.py:apply:20;map.py:move:30', 3.0),
+        ('game.py:resolve:10;map.py:move:30', 1.0),
+    ]
+
+
+def test_collapsed_stacks_start_from_recursive_entry_points():
+    # resolve and apply only call each other, nothing outside the cycle calls either
+    stats = {
+        R: (1, 2, 1.0, 6.0, {A: (1, 1, 1.0, 5.0)}),
+        A: (1, 1, 2.0, 5.0, {R: (1, 1, 2.0, 5.0)}),
+        B: (1, 1, 3.0, 3.0, {A: (1, 1, 3.0, 3.0)}),
+    }
+    stacks = dict(collapsed_stacks(stats))
+    assert stacks['game.py:resolve:10'] == 1.0
+    assert stacks['game.py:resolve:10;map.py:apply:20;map.py:move:30'] == 3.0
+
+
+def test_run_turn_records_turns_even_when_they_fail():
+    profiler = LobbyProfiler('L', turns=2)
+    profiler.run_turn(lambda: None)
+    try:
+        profiler.run_turn(lambda: 1 / 0)
+    except ZeroDivisionError:
+        pass
+    assert profiler.finished and profiler.phases['turn'][0] == 2
+    report = profiler.report()
+    assert report['turns'] == 2 and report['phases']['turn']['count'] == 2 and 'profile' not in report
+
+
+def test_report_writes_the_sampled_turns(tmp_path):
+    profiler = LobbyProfiler('L', turns=4, every=2, cprofile=True, output_dir=str(tmp_path))
+    for _ in range(4):
+        profiler.run_turn(lambda: sorted(range(1000), key=lambda i: -i))
+    report = profiler.report()
+    assert report['profiled_turns'] == 2
+    assert os.path.exists(report['profile'])
+    with open(report['collapsed']) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('test_LobbyProfiler.py' in line for line in lines)
+
+
+def test_profile_report_includes_the_game_over_turn(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(GameClient, 'PROFILE_DIR', str(tmp_path))
+    for player, team in (('A', 'TeamA'), ('B', 'TeamB')):
+        body = {'lobby_name': 'L', 'team_name': team, 'player_name': player}
+        GameClient.handle_message(client, 'new_game', json.dumps(body).encode())
+    GameClient.handle_message(client, 'games/L/start', b'START')
+    # One coin left, next to A
+    game = client.game_dict['L'] = emptyGame({'A': (0, 0), 'B': (5, 5)}, {(0, 2): Coin1()})
+    # The count is kept from map generation, clearing the board does not lower it
+    game.map._Map__numCoins = 1
+    GameClient.handle_message(client, 'admin/profile', json.dumps({'lobby_name': 'L', 'turns': 10}).encode())
+    client.take()
+
+    for turn in range(2):
+        GameClient.handle_message(client, 'games/L/A/move', Moveset.RIGHT.name.encode())
+        GameClient.handle_message(client, 'games/L/B/move', Moveset.UP.name.encode())
+
+    assert 'L' not in client.game_dict and 'L' not in client.profiler_dict
+    assert ('games/L/lobby', 'Game Over: All coins have been collected', 1) in client.published
+    reports = [json.loads(payload) for _, payload, _ in client.take('admin/profile/L')]
+    assert len(reports) == 1
+    assert reports[0]['turns'] == 2 and reports[0]['phases']['turn']['count'] == 2
@@ -0,0 +1,60 @@
+import pytest
+
+from TopicRouter import TopicRouter
+
+
+def make_router(calls: list) -> TopicRouter:
+    return TopicRouter() \
+        .add('new_game', lambda client, payload: calls.append(('new_game', payload))) \
+        .add('games/+/start', lambda client, lobby, payload: calls.append(('start', lobby, payload))) \
+        .add('games/+/+/move', lambda client, lobby, player, payload: calls.append(('move', lobby, player, payload))) \
+        .add('admin/#', lambda client, rest, payload: calls.append(('admin', rest, payload)))
+
+
+@pytest.mark.parametrize('topic, expected', (
+    ('new_game', (0, ())),
+    ('games/L1/start', (1, ('L1',))),
+    ('games/L1/p.1/move', (2, ('L1', 'p.1'))),
+    ('admin/profile/L1', (3, ('profile/L1',))),
+    ('games/L1/move', None),
+    ('games//start', None),
+    ('games/L1/p1/move/extra', None),
+    ('new_game/x', None),
+    ('xnew_game', None),
+))
+def test_match(topic, expected):
+    assert make_router([]).match(topic) == expected
+
+
+def test_dispatch_passes_levels_and_counts_routes():
+    calls = []
+    router = make_router(calls)
+    assert router.dispatch(None, 'games/L/p/move', b'UP')
+    assert router.dispatch(None, 'games/L/p/move', b'DOWN')
+    assert router.dispatch(None, 'games/L/start', b'START')
+    assert not router.dispatch(None, 'games/L/p/chat', b'hi')
+
+    assert calls == [('move', 'L', 'p', b'UP'), ('move', 'L', 'p', b'DOWN'), ('start', 'L', b'START')]
+    assert router.counts() == {'new_game': 0, 'games/+/start': 1, 'games/+/+/move': 2, 'admin/#': 0}
+    assert router.unmatched == 1
+
+
+def test_routes_added_after_matching_are_compiled_in():
+    calls = []
+    router = make_router(calls)
+    assert router.match('games/L/lobby') is None
+    router.add('games/+/lobby', lambda client, lobby, payload: calls.append(('lobby', lobby)))
+    assert router.dispatch(None, 'games/L/lobby', b'')
+    assert calls == [('lobby', 'L')]
+    assert router.patterns[-1] == 'games/+/lobby'
+
+
+def test_hash_must_be_the_last_level():
+    with pytest.raises(AssertionError):
+        TopicRouter().add('admin/#/x', lambda *args: None).match('admin/a/x')
+
+
+def test_first_matching_route_wins():
+    router = TopicRouter().add('games/+/start', print).add('games/#', print)
+    assert router.match('games/L/start') == (0, ('L',))
+    assert router.match('games/L/p/move') == (1, ('L/p/move',))
@@ -0,0 +1,60 @@
+import json
+import random
+
+import pytest
+
+import GameClient
+import WireFormat
+from game import Game
+from WireFormat import decode_game_state, decode_scores, encode_game_state, encode_scores, negotiate
+
+FORMATS = WireFormat.WIRE_FORMATS
+
+
+def as_bytes(payload) -> bytes:
+    return payload.encode() if isinstance(payload, str) else payload
+
+
+def test_negotiate():
+    assert negotiate(None, 'binary') == 'binary'
+    assert negotiate('binary', 'binary') == 'binary'
+    assert negotiate('binary', 'json') == 'json'
+    assert negotiate('json', 'binary') == 'json'
+    assert negotiate(None, 'carrier-pigeon') == 'json'
+
+
+@pytest.mark.parametrize('wire_format', FORMATS)
+def test_game_state_round_trip(wire_format):
+    random.seed(3)
+    game = Game({'Team': ['a', 'bé', 'c'], 'Other': ['d']}, 30, 30)
+    for name in game.all_players:
+        game_data = game.getGameData(name, 10)
+        decoded = decode_game_state(as_bytes(encode_game_state(game_data, wire_format)))
+        assert decoded == json.loads(json.dumps(game_data))
+
+
+@pytest.mark.parametrize('wire_format', FORMATS)
+def test_scores_round_trip(wire_format):
+    scores = {'TeamA': 0, 'Téam B': 123456, 'C': -1}
+    assert decode_scores(as_bytes(encode_scores(scores, wire_format))) == scores
+
+
+def test_binary_is_smaller_than_json():
+    random.seed(3)
+    game = Game({'Team': ['a', 'b'], 'Other': ['c']}, 30, 30)
+    game_data = game.getGameData('a', 5)
+    assert len(encode_game_state(game_data, 'binary')) < len(encode_game_state(game_data, 'json'))
+
+
+@pytest.mark.parametrize('requested, expected', ((('binary', 'binary'), 'binary'), (('binary', 'json'), 'json')))
+def test_server_publishes_in_the_negotiated_format(client, requested, expected):
+    for (player, team), wire_format in zip((('a', 'A'), ('b', 'B')), requested):
+        body = {'lobby_name': 'L', 'team_name': team, 'player_name': player, 'wire_format': wire_format}
+        GameClient.handle_message(client, 'new_game', json.dumps(body).encode())
+    GameClient.handle_message(client, 'games/L/start', b'START')
+    assert client.format_dict['L'] == expected
+
+    game = client.game_dict['L']
+    for topic, payload, _ in client.take('/game_state'):
+        assert (as_bytes(payload)[:1] == bytes((WireFormat.MAGIC,))) == (expected == 'binary')
+        assert decode_game_state(as_bytes(payload)) == json.loads(json.dumps(game.getGameData(topic.split('/')[2])))
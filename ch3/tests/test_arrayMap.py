@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pytest
+
+from arrayMap import ArrayMap, EMPTY, WALL, COIN1, PLAYER
+from gameItems import Coin1, Wall
+from map import Map
+from player import Player
+
+
+def makeMaps(seed: int, size: int = 10):
+    # Both backends place the same players, they end up on the same cells given the same seed
+    players = [Player('Charles', None), Player('James', None)]
+    maps = []
+    for mapType in (Map, ArrayMap):
+        random.seed(seed)
+        maps.append(mapType(size, size, players))
+    return maps
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_same_board_as_map(seed):
+    listMap, arrayMap = makeMaps(seed)
+    assert arrayMap.map.tolist() == listMap.map.tolist()
+    assert arrayMap.numCoins == listMap.numCoins
+    assert repr(arrayMap) == repr(listMap)
+
+
+def test_set_and_get_round_trip():
+    _, m = makeMaps(0)
+    player = m.map.get(next((x, y) for x in range(10) for y in range(10) if m.kinds[x, y] == PLAYER))
+    oldLoc = player.loc
+    newLoc = next((x, y) for x in range(10) for y in range(10) if m.kinds[x, y] == EMPTY)
+
+    m.set(oldLoc, None)
+    m.set(newLoc, player)
+    assert m.get(oldLoc) is None and m.kinds[oldLoc] == EMPTY
+    assert m.get(newLoc) is player and m.playerAt(newLoc) is player
+    assert oldLoc not in m.players
+
+    m.set(newLoc, Coin1())
+    assert m.kinds[newLoc] == COIN1 and newLoc not in m.players
+    m.set(newLoc, Wall())
+    assert m.get(newLoc) is Wall() and m.kinds[newLoc] == WALL
+
+
+def test_kinds_are_read_only():
+    _, m = makeMaps(0)
+    assert isinstance(m.kinds, np.ndarray) and m.kinds.dtype == np.int8
+    with pytest.raises(ValueError):
+        m.kinds[0, 0] = WALL
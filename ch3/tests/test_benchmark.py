@@ -0,0 +1,30 @@
+from benchmark import BENCHMARKS, benchMemory, compareResults, formatResult, makePlayers, memoryResults, timeIt
+from arrayMap import ArrayMap
+
+
+def test_compare_flags_only_slowdowns_past_the_threshold():
+    baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    results = {'a': 1.05, 'b': 1.2, 'c': 0.5, 'new': 9.0}
+    assert compareResults(baseline, results, 0.1) == ['b']
+    assert compareResults(baseline, results, 0.01) == ['a', 'b']
+
+
+def test_make_players_spreads_players_over_teams():
+    teams = makePlayers(5, 2)
+    assert teams == {'Team0': ['Player0_0', 'Player0_2', 'Player0_4'], 'Team1': ['Player1_1', 'Player1_3']}
+
+
+def test_time_it_and_memory():
+    assert timeIt(lambda: None, repeat=1) > 0
+    result = benchMemory(size=50, numPlayers=4, mapType=ArrayMap)
+    assert result['map'] == 'ArrayMap' and result['bytes'] > 50 * 50
+    assert set(BENCHMARKS) >= {'mapGeneration', 'movePlayer', 'applyMoves', 'gameData', 'repr', 'serialization'}
+
+
+def test_memory_results_are_saved_and_compared_per_cell():
+    results = memoryResults(size=50, numPlayers=4)
+    assert set(results) == {'memory[Map,50]', 'memory[ArrayMap,50]'}
+    assert 0 < results['memory[ArrayMap,50]'] < results['memory[Map,50]']
+    assert formatResult('memory[Map,50]', 9.5).strip() == '9.50 B/cell'
+    assert formatResult('movePlayer[Map]', 2e-6).strip() == '2.00 us'
+    assert compareResults(results, {name: 2 * value for name, value in results.items()}, 0.1) == list(results)
@@ -0,0 +1,201 @@
+import json
+import random
+
+import pytest
+
+from arrayMap import ArrayMap
+from game import Game
+from map import Map
+from moveset import Moveset
+from gameItems import Coin1, Coin3, Wall
+from player import Player
+
+PLAYERS = {'TeamA': ['Charles', 'Girish'], 'TeamB': ['James', 'Alex']}
+
+
+def makeGames(seed: int, playerNames: dict = PLAYERS, size: int = 10) -> tuple[Game, Game]:
+    games = []
+    for mapType in (Map, ArrayMap):
+        random.seed(seed)
+        games.append(Game(playerNames, size, size, mapType=mapType))
+    return games[0], games[1]
+
+
+def playRandomTurns(games, turns: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(turns):
+        moves = [(playerName, rng.choice(list(Moveset))) for playerName in games[0].all_players]
+        for game in games:
+            game.applyMoves(moves, sequential=True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('radius', (1, 2, 5, 20))
+def test_array_map_game_data_matches_map(seed, radius):
+    listGame, arrayGame = makeGames(seed)
+    for turn in range(3):
+        for playerName in PLAYERS['TeamA'] + PLAYERS['TeamB']:
+            assert arrayGame.getGameData(playerName, radius) == listGame.getGameData(playerName, radius)
+        playRandomTurns((listGame, arrayGame), 5, seed + turn)
+
+
+@pytest.mark.parametrize('mapType', (Map, ArrayMap))
+@pytest.mark.parametrize('numPlayers, size', ((4, 10), (4, 60), (30, 20)))
+@pytest.mark.parametrize('radius', (0, 2, 5, 10))
+def test_all_game_data_matches_get_game_data(mapType, numPlayers, size, radius):
+    # Covers both the shared scan and, for the sparse ArrayMap lobbies at wide radii, the per-player path
+    random.seed(numPlayers + size)
+    playerNames = {f'Team{t}': [f'Player{t}_{p}' for p in range(t, numPlayers, 2)] for t in range(2)}
+    game = Game(playerNames, size, size, mapType=mapType)
+    for seed in range(3):
+        allGameData = game.getAllGameData(radius)
+        assert list(allGameData) == list(game.all_players)
+        for playerName, gameData in allGameData.items():
+            assert gameData == game.getGameData(playerName, radius)
+        playRandomTurns((game,), 3, seed)
+
+
+def emptyGame(playerLocs: dict[str, tuple[int, int]], items: dict = None, size: int = 10, mapType: type = Map) -> Game:
+    """
+    :return: a game with only the given players and items on the board, every player in a team of their own
+    """
+    random.seed(0)
+    game = Game({f'Team{name}': [name] for name in playerLocs}, size, size, mapType=mapType)
+    for x in range(size):
+        for y in range(size):
+            if not isinstance(game.map.get((x, y)), Player):
+                game.map.set((x, y), None)
+    # Lift every player off the board first so no one is overwritten, then re-index them at their new cell
+    index = game._Game__playerIndex
+    for player in game.all_players.values():
+        game.map.set(player.loc, None)
+    for name, loc in playerLocs.items():
+        player = game.getPlayer(name)
+        oldLoc, player.loc = player.loc, loc
+        game.map.set(loc, player)
+        index.move(player, oldLoc)
+    for loc, item in (items or {}).items():
+        game.map.set(loc, item)
+    return game
+
+
+def locs(game: Game) -> dict[str, tuple[int, int]]:
+    return {name: player.loc for name, player in game.all_players.items()}
+
+
+R, L, U, D = Moveset.RIGHT, Moveset.LEFT, Moveset.UP, Moveset.DOWN
+
+
+@pytest.mark.parametrize('start, moves, expected', (
+    # First claim on a contested cell wins
+    ({'A': (0, 0), 'B': (0, 2)}, [('A', R), ('B', L)], {'A': (0, 1), 'B': (0, 2)}),
+    ({'A': (0, 0), 'B': (0, 2)}, [('B', L), ('A', R)], {'A': (0, 0), 'B': (0, 1)}),
+    # Swaps are blocked, following into a vacated cell is not
+    ({'A': (0, 0), 'B': (0, 1)}, [('A', R), ('B', L)], {'A': (0, 0), 'B': (0, 1)}),
+    ({'A': (0, 0), 'B': (0, 1)}, [('A', R), ('B', R)], {'A': (0, 1), 'B': (0, 2)}),
+    # A player who stays blocks the chain behind them
+    ({'A': (0, 0), 'B': (0, 1), 'C': (0, 2)}, [('A', R), ('B', R)], {'A': (0, 0), 'B': (0, 1), 'C': (0, 2)}),
+    ({'A': (0, 0), 'B': (0, 1), 'C': (0, 2)}, [('A', R), ('B', R), ('C', U)], {'A': (0, 0), 'B': (0, 1), 'C': (0, 2)}),
+    ({'A': (0, 0), 'B': (0, 1), 'C': (0, 2)}, [('A', R), ('B', R), ('C', D)], {'A': (0, 1), 'B': (0, 2), 'C': (1, 2)}),
+    # A rotation longer than a swap goes through
+    ({'A': (0, 0), 'B': (0, 1), 'C': (1, 1), 'D': (1, 0)}, [('A', R), ('B', D), ('C', L), ('D', U)],
+     {'A': (0, 1), 'B': (1, 1), 'C': (1, 0), 'D': (0, 0)}),
+))
+def test_simultaneous_conflicts(start, moves, expected):
+    game = emptyGame(start)
+    game.applyMoves(moves)
+    assert locs(game) == expected
+    for name, loc in expected.items():
+        assert game.map.get(loc) is game.getPlayer(name)
+
+
+def test_simultaneous_walls_coins_and_edges():
+    game = emptyGame({'A': (1, 1), 'B': (3, 3), 'C': (2, 2)}, {(1, 2): Wall(), (3, 4): Coin3(), (2, 3): Coin1()})
+    coins = game.map.numCoins
+    # A walks into the wall, B and C collect the coins they step on
+    game.applyMoves([('A', R), ('B', R), ('C', R)])
+    assert locs(game) == {'A': (1, 1), 'B': (3, 4), 'C': (2, 3)}
+    assert game.getScores() == {'TeamA': 0, 'TeamB': 3, 'TeamC': 1}
+    assert game.map.numCoins == coins - 2
+
+    # Off the map
+    for move in (U, U, L, L):
+        game.applyMoves([('A', move)])
+    assert locs(game)['A'] == (0, 0)
+
+    with pytest.raises(ValueError):
+        game.applyMoves([('A', D), ('A', D)])
+    with pytest.raises(KeyError):
+        game.applyMoves([('Nobody', D)])
+    with pytest.raises(TypeError):
+        game.applyMoves([('A', 'DOWN')])
+
+
+@pytest.mark.parametrize('mapType', (Map, ArrayMap))
+def test_simultaneous_turns_leave_snapshots_alone(mapType):
+    game = emptyGame({'A': (0, 0), 'B': (5, 5)}, {(0, 1): Coin1()}, mapType=mapType)
+    before = game.map.snapshot()
+    game.applyMoves([('A', R), ('B', U)])
+    assert locs(game) == {'A': (0, 1), 'B': (4, 5)}
+    assert before.get((0, 0)) is game.getPlayer('A') and before.get((0, 1)) is Coin1()
+    assert before.get((5, 5)) is game.getPlayer('B') and before.get((4, 5)) is None
+    assert game.map.get((5, 5)) is None and game.map.get((4, 5)) is game.getPlayer('B')
+
+
+def test_simultaneous_turns_keep_the_board_consistent():
+    listGame, arrayGame = makeGames(4, {f'Team{t}': [f'P{t}_{p}' for p in range(6)] for t in range(3)}, size=12)
+    rng = random.Random(4)
+    for _ in range(40):
+        moves = [(name, rng.choice(list(Moveset))) for name in listGame.all_players if rng.random() < 0.8]
+        for game in (listGame, arrayGame):
+            game.applyMoves(moves)
+            players = list(game.all_players.values())
+            assert len({player.loc for player in players}) == len(players)
+            assert all(game.map.get(player.loc) is player for player in players)
+            assert game.map.numEmpty == sum(game.map.get((x, y)) is None for x in range(12) for y in range(12))
+            assert game.playersNear((6, 6), 12) == sorted(players, key=lambda player: player.loc)
+        assert locs(listGame) == locs(arrayGame)
+        assert listGame.getScores() == arrayGame.getScores()
+
+
+def test_sequential_is_move_player_in_order():
+    random.seed(2)
+    a = Game(PLAYERS, 10, 10)
+    random.seed(2)
+    b = Game(PLAYERS, 10, 10)
+    rng = random.Random(2)
+    for _ in range(30):
+        moves = [(name, rng.choice(list(Moveset))) for name in a.all_players]
+        a.applyMoves(moves, sequential=True)
+        for name, move in moves:
+            b.movePlayer(name, move)
+        assert locs(a) == locs(b) and a.getScores() == b.getScores()
+
+
+def test_cached_payload_is_rebuilt_only_when_a_score_changes():
+    game = emptyGame({'A': (0, 0), 'B': (5, 5)}, {(0, 2): Coin1()})
+    builds = []
+    build = lambda g: builds.append(g.version) or len(builds)
+
+    version = game.version
+    assert game.cachedPayload('key', build) == game.cachedPayload('key', build) == 1
+    game.applyMoves([('A', R), ('B', U)])
+    assert game.version == version and game.cachedPayload('key', build) == 1
+
+    game.applyMoves([('A', R)])
+    assert game.version == version + 1 and game.getScores()['TeamA'] == 1
+    assert game.cachedPayload('key', build) == 2 and builds == [version, version + 1]
+
+    # Callers get their own copy of the cached scores
+    game.getScores()['TeamA'] = 100
+    assert game.getScores()['TeamA'] == 1
+
+
+def test_server_reuses_the_encoded_scores():
+    import GameClient
+    game = emptyGame({'A': (0, 0), 'B': (5, 5)}, {(0, 2): Coin1()})
+    first = GameClient.scores_payload(game, 'json')
+    game.applyMoves([('A', R)])
+    assert GameClient.scores_payload(game, 'json') is first
+    game.applyMoves([('A', R)])
+    assert json.loads(GameClient.scores_payload(game, 'json')) == {'TeamA': 1, 'TeamB': 0}
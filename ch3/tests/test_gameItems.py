@@ -0,0 +1,20 @@
+import pytest
+
+from gameItems import Coin, Coin1, Coin2, Coin3, Wall
+from player import Player
+from team import Team
+
+
+def test_items_are_shared_per_class():
+    assert Wall() is Wall()
+    assert Coin1() is Coin1() and Coin2() is Coin2() and Coin3() is Coin3()
+    assert len({id(Wall()), id(Coin1()), id(Coin2()), id(Coin3())}) == 4
+    assert [coin().value for coin in (Coin1, Coin2, Coin3)] == [1, 2, 3]
+    assert isinstance(Coin2(), Coin) and not isinstance(Wall(), Coin)
+
+
+@pytest.mark.parametrize('obj', (Wall(), Coin1(), Player('Charles', Team('TeamA')), Team('TeamA')))
+def test_slots(obj):
+    assert not hasattr(obj, '__dict__')
+    with pytest.raises(AttributeError):
+        obj.extra = 1
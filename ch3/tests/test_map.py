@@ -0,0 +1,166 @@
+import random
+
+import pytest
+
+from arrayMap import ArrayMap
+from gameItems import Coin, Coin1, Coin2, Coin3, Wall
+from map import Map, MapView
+from player import Player
+
+MAP_TYPES = (Map, ArrayMap)
+
+
+def makeMap(mapType: type[Map], seed: int = 0, size: int = 10, numPlayers: int = 2) -> Map:
+    random.seed(seed)
+    return mapType(size, size, [Player(f'Player{i}', None) for i in range(numPlayers)])
+
+
+def emptyCells(m: Map) -> list[tuple[int, int]]:
+    return [(x, y) for x in range(m.height) for y in range(m.width) if m.get((x, y)) is None]
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_map_view_reads_the_live_grid(mapType):
+    m = makeMap(mapType)
+    view = m.map
+    assert isinstance(view, MapView)
+    assert len(view) == view.height == m.height and view.width == m.width
+
+    loc = emptyCells(m)[0]
+    m.set(loc, Wall())
+    assert view.get(loc) is Wall() and view[loc[0]][loc[1]] is Wall()
+    with pytest.raises(TypeError):
+        view[loc[0]][loc[1]] = None
+    with pytest.raises(IndexError):
+        view[m.height]
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_snapshot_is_isolated_from_later_writes(mapType):
+    m = makeMap(mapType)
+    before = m.map.tolist()
+    snapshot = m.snapshot()
+
+    # Several writes to the same row and to another row, the first one copies the row
+    (x1, y1), (x2, y2) = emptyCells(m)[0], emptyCells(m)[-1]
+    m.set((x1, y1), Coin1())
+    m.set((x1, y1), Wall())
+    m.set((x2, y2), Coin1())
+
+    assert snapshot.tolist() == before
+    assert snapshot.get((x1, y1)) is None and list(snapshot)[x2][y2] is None
+    assert m.get((x1, y1)) is Wall() and m.get((x2, y2)) is Coin1()
+
+    # A later snapshot sees the writes and is in turn isolated from the next ones
+    later = m.snapshot()
+    m.set((x1, y1), None)
+    assert later.get((x1, y1)) is Wall()
+    assert snapshot.get((x1, y1)) is None
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_tolist_is_a_mutable_copy(mapType):
+    m = makeMap(mapType)
+    grid = m.map.tolist()
+    x, y = emptyCells(m)[0]
+    grid[x][y] = Wall()
+    assert m.get((x, y)) is None
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_free_cell_count_follows_writes(mapType):
+    m = makeMap(mapType, seed=3)
+    assert m.numEmpty == len(emptyCells(m))
+
+    rng = random.Random(3)
+    for _ in range(500):
+        loc = (rng.randrange(m.height), rng.randrange(m.width))
+        if isinstance(m.get(loc), Player):
+            continue
+        m.set(loc, rng.choice((None, None, Wall(), Coin1())))
+        assert m.numEmpty == len(emptyCells(m))
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_players_fill_every_free_cell(mapType):
+    random.seed(0)
+    players = [Player(f'Player{i}', None) for i in range(9)]
+    m = mapType(3, 3, players, wallChoices=[])
+    assert m.numEmpty == 0
+    assert sorted(player.loc for player in players) == [(x, y) for x in range(3) for y in range(3)]
+    assert all(m.get(player.loc) is player for player in players)
+
+    with pytest.raises(ValueError):
+        mapType(3, 3, players + [Player('Extra', None)], wallChoices=[])
+
+
+def scanCoins(m: Map, coinType=None) -> list[tuple[int, int]]:
+    return [(x, y) for x in range(m.height) for y in range(m.width)
+            if isinstance(m.get((x, y)), coinType or Coin)]
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_coin_index_matches_a_scan(mapType):
+    m = makeMap(mapType, seed=5, size=12)
+    rng = random.Random(5)
+    for step in range(300):
+        loc = (rng.randrange(m.height), rng.randrange(m.width))
+        if not isinstance(m.get(loc), Player):
+            m.set(loc, rng.choice((None, Wall(), Coin1(), Coin2(), Coin3())))
+        if step % 30:
+            continue
+
+        assert m.coinPositions() == scanCoins(m)
+        assert m.remainingValue == sum(m.get(loc).value for loc in scanCoins(m))
+        for coinType in (Coin1, Coin2, Coin3):
+            assert m.coinPositions(coinType) == scanCoins(m, coinType)
+            assert m.coinCounts()[coinType.__name__] == len(scanCoins(m, coinType))
+
+        for minX, maxX, minY, maxY in ((0, 2, 0, 2), (-3, 20, -3, 20), (4, 9, 1, 6)):
+            assert m.coinsInRect(minX, maxX, minY, maxY) == [
+                (x, y) for x, y in scanCoins(m) if minX <= x <= maxX and minY <= y <= maxY]
+
+        center = (rng.randrange(m.height), rng.randrange(m.width))
+        distance = lambda c: (abs(c[0] - center[0]) + abs(c[1] - center[1]), c)
+        assert m.nearestCoin(center) == min(scanCoins(m), key=distance, default=None)
+
+
+def test_nearest_coin_on_a_board_without_coins():
+    random.seed(0)
+    m = Map(3, 3, [], wallChoices=[])
+    for loc in m.coinPositions():
+        m.set(loc, None)
+    assert m.nearestCoin((1, 1)) is None and m.remainingValue == 0
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+@pytest.mark.parametrize('keep', (1.0, 0.05))
+def test_coin_index_across_tiles(mapType, keep):
+    # A board spanning several partial coin tiles, dense as generated and with a few coins left far apart
+    random.seed(7)
+    m = mapType(50, 37, [Player('Player0', None)], wallChoices=[])
+    rng = random.Random(7)
+    for loc in m.coinPositions():
+        if rng.random() > keep:
+            m.set(loc, None)
+    coins = scanCoins(m)
+    assert m.coinPositions() == coins and sum(m.coinCounts().values()) == len(coins)
+    assert m.coinPositions(Coin2) == scanCoins(m, Coin2)
+
+    for _ in range(50):
+        center = (rng.randrange(m.height), rng.randrange(m.width))
+        distance = lambda c: (abs(c[0] - center[0]) + abs(c[1] - center[1]), c)
+        assert m.nearestCoin(center) == min(coins, key=distance, default=None)
+        assert m.nearestCoin(center, Coin3) == min(scanCoins(m, Coin3), key=distance, default=None)
+
+        minX, minY = rng.randrange(-5, m.height), rng.randrange(-5, m.width)
+        maxX, maxY = minX + rng.randrange(40), minY + rng.randrange(40)
+        assert m.coinsInRect(minX, maxX, minY, maxY) == [
+            (x, y) for x, y in coins if minX <= x <= maxX and minY <= y <= maxY]
+
+
+@pytest.mark.parametrize('mapType', MAP_TYPES)
+def test_free_cell_index_is_released_after_generation(mapType):
+    m = makeMap(mapType, seed=1)
+    assert m._Map__free is None and m._Map__freePos is None
+    assert m.numEmpty == len(emptyCells(m))
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from player import Player
+from playerIndex import PlayerIndex
+
+
+def bruteNear(players, loc, radius):
+    return sorted((p for p in players if abs(p.loc[0] - loc[0]) <= radius and abs(p.loc[1] - loc[1]) <= radius),
+                  key=lambda p: p.loc)
+
+
+@pytest.mark.parametrize('bucketSize', (1, 3, 8))
+def test_near_matches_a_scan_as_players_move(bucketSize):
+    rng = random.Random(bucketSize)
+    players = [Player(f'Player{i}', None) for i in range(40)]
+    index = PlayerIndex(bucketSize)
+    # Players never share a cell
+    for player, loc in zip(players, rng.sample([(x, y) for x in range(50) for y in range(50)], len(players))):
+        player.loc = loc
+        index.add(player)
+
+    for _ in range(200):
+        player = rng.choice(players)
+        oldLoc = player.loc
+        newLoc = (min(max(oldLoc[0] + rng.randint(-9, 9), 0), 49), min(max(oldLoc[1] + rng.randint(-9, 9), 0), 49))
+        if all(other.loc != newLoc for other in players):
+            player.loc = newLoc
+            index.move(player, oldLoc)
+
+        loc = (rng.randrange(50), rng.randrange(50))
+        # Small windows walk the tiles, windows larger than the occupied buckets walk the buckets
+        for radius in (0, 2, 10, 100):
+            assert index.near(loc, radius) == bruteNear(players, loc, radius)
+
+
+def test_remove():
+    index = PlayerIndex(4)
+    a, b = Player('A', None), Player('B', None)
+    a.loc, b.loc = (1, 1), (2, 2)
+    index.add(a)
+    index.add(b)
+    index.remove(a)
+    assert index.near((1, 1), 5) == [b]
+
+    # A player is removed from the bucket it was indexed at, not the one it has since moved to
+    b.loc = (20, 20)
+    index.remove(b, (2, 2))
+    assert index.near((2, 2), 30) == []
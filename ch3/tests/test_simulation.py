@@ -0,0 +1,34 @@
+import pytest
+
+from arrayMap import ArrayMap
+from map import Map
+from moveset import Moveset
+from simulation import simulate, greedyPolicy, randomPolicy, scriptedPolicy
+
+DETERMINISTIC = ('games', 'gamesFinished', 'turns', 'moves', 'coinsCollected', 'valueCollected')
+
+
+def outcome(stats: dict) -> dict:
+    return {key: stats[key] for key in DETERMINISTIC}
+
+
+@pytest.mark.parametrize('policy', (randomPolicy, greedyPolicy))
+def test_seeded_runs_repeat_and_backends_agree(policy):
+    runs = [simulate(20, 100, policy=policy, mapType=mapType, seed=7) for mapType in (Map, Map, ArrayMap)]
+    assert outcome(runs[0]) == outcome(runs[1]) == outcome(runs[2])
+
+    stats = runs[0]
+    assert stats['moves'] == 4 * stats['turns']
+    assert 0 <= stats['gamesFinished'] <= stats['games']
+    assert stats['valueCollected'] >= stats['coinsCollected'] > 0
+
+
+def test_greedy_finishes_more_games_than_random():
+    greedy = simulate(50, 200, policy=greedyPolicy, seed=1)
+    random = simulate(50, 200, policy=randomPolicy, seed=1)
+    assert greedy['gamesFinished'] > random['gamesFinished']
+
+
+def test_scripted_policy_replays_in_a_loop():
+    policy = scriptedPolicy({'Player1': [Moveset.UP, Moveset.LEFT]})
+    assert [policy(None, 'Player1') for _ in range(5)] == [Moveset.UP, Moveset.LEFT, Moveset.UP, Moveset.LEFT, Moveset.UP]